@@ -1,12 +1,13 @@
 """
 Doctor login API: email + password -> JWT; GET me with Bearer token.
 """
-import json
-from django.http import JsonResponse
+import orjson
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth import authenticate, get_user_model
 
+from config.responses import ORJSONResponse
+
 from .auth_jwt import make_access_token, decode_access_token
 
 User = get_user_model()
@@ -50,33 +51,33 @@ def login(request):
     Doctors are staff users; login by email (case-insensitive).
     """
     try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+        body = orjson.loads(request.body) if request.body else {}
+    except orjson.JSONDecodeError:
+        return ORJSONResponse({"detail": "Invalid JSON."}, status=400)
 
     email = (body.get("email") or "").strip()
     password = body.get("password") or ""
 
     if not email:
-        return JsonResponse({"detail": "Email is required."}, status=400)
+        return ORJSONResponse({"detail": "Email is required."}, status=400)
     if not password:
-        return JsonResponse({"detail": "Password is required."}, status=400)
+        return ORJSONResponse({"detail": "Password is required."}, status=400)
 
     user = User.objects.filter(email__iexact=email).first()
     if not user:
-        return JsonResponse({"detail": "Invalid email or password."}, status=401)
+        return ORJSONResponse({"detail": "Invalid email or password."}, status=401)
     if not user.check_password(password):
-        return JsonResponse({"detail": "Invalid email or password."}, status=401)
+        return ORJSONResponse({"detail": "Invalid email or password."}, status=401)
     if not user.is_active:
-        return JsonResponse({"detail": "Account is disabled."}, status=401)
+        return ORJSONResponse({"detail": "Account is disabled."}, status=401)
     if not user.is_staff:
-        return JsonResponse(
+        return ORJSONResponse(
             {"detail": "Only staff (doctors) can sign in here."},
             status=403,
         )
 
     access_token = make_access_token(user.pk, user.email or "")
-    return JsonResponse({
+    return ORJSONResponse({
         "accessToken": access_token,
         "user": _user_to_json(user),
     })
@@ -91,5 +92,5 @@ def me(request):
     """
     user = _get_user_from_request(request)
     if not user:
-        return JsonResponse({"detail": "Invalid or missing token."}, status=401)
-    return JsonResponse({"user": _user_to_json(user)})
+        return ORJSONResponse({"detail": "Invalid or missing token."}, status=401)
+    return ORJSONResponse({"user": _user_to_json(user)})
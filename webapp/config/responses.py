@@ -0,0 +1,21 @@
+"""
+JSON response shared by every app's API views.
+"""
+import orjson
+from django.http import HttpResponse
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class ORJSONResponse(HttpResponse):
+    """
+    JSON response serialised with orjson, which emits UTF-8 bytes directly.
+    Bytes are taken as an already-encoded JSON body and sent unchanged.
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        if not isinstance(data, bytes):
+            data = orjson.dumps(data, option=ORJSON_OPTIONS)
+        super().__init__(content=data, **kwargs)
@@ -14,31 +14,38 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import orjson
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
 
+from config.responses import ORJSONResponse
 from nfc_users.views import nfc_scan as nfc_scan_view
 
 
+# The root payload never changes at runtime; serialise it once at import.
+_API_ROOT_BODY = orjson.dumps({
+    "service": "medlink-api",
+    "status": "running",
+    "routes": [
+        "/api/auth/login/",
+        "/api/auth/me/",
+        "/api/patients/",
+        "/api/patients/ndjson/",
+        "/api/patients/ai-overview/",
+        "/api/patients/risk-score/",
+        "/api/patients/risk-score-batch/",
+        "/api/patients/<id>/",
+        "/api/patients/by-nfc/<nfc_id>/",
+        "/api/nfc/scan/",
+        "/api/users/",
+        "/admin/",
+    ],
+})
+
+
 def api_root(request):
     """API info at root. React frontend runs via Next.js and calls these endpoints."""
-    return JsonResponse({
-        "service": "medlink-api",
-        "status": "running",
-        "routes": [
-            "/api/auth/login/",
-            "/api/auth/me/",
-            "/api/patients/",
-            "/api/patients/ai-overview/",
-            "/api/patients/risk-score/",
-            "/api/patients/<id>/",
-            "/api/patients/by-nfc/<nfc_id>/",
-            "/api/nfc/scan/",
-            "/api/users/",
-            "/admin/",
-        ],
-    })
+    return ORJSONResponse(_API_ROOT_BODY)
 
 
 urlpatterns = [
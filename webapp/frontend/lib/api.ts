@@ -47,7 +47,7 @@ const API_BASE_URL =
   process.env.DJANGO_API_BASE_URL ||
   "http://127.0.0.1:8000"
 
-async function fetchJson<T>(path: string, init?: RequestInit): Promise<T> {
+async function fetchOk(path: string, init?: RequestInit): Promise<Response> {
   const headers: Record<string, string> = {
     "Content-Type": "application/json",
     ...((init?.headers as Record<string, string>) ?? {}),
@@ -65,11 +65,47 @@ async function fetchJson<T>(path: string, init?: RequestInit): Promise<T> {
     throw new Error(`API request failed (${response.status}): ${path}`)
   }
 
+  return response
+}
+
+async function fetchJson<T>(path: string, init?: RequestInit): Promise<T> {
+  const response = await fetchOk(path, init)
   return (await response.json()) as T
 }
 
+/**
+ * Fetch a newline-delimited JSON stream (one object per line). Lines are
+ * parsed as chunks arrive, so decoding overlaps the download.
+ */
+async function fetchNdjson<T>(path: string, init?: RequestInit): Promise<T[]> {
+  const response = await fetchOk(path, init)
+  const items: T[] = []
+  const pushLine = (line: string) => {
+    if (line.trim()) items.push(JSON.parse(line) as T)
+  }
+  if (!response.body) {
+    const text = await response.text()
+    text.split("\n").forEach(pushLine)
+    return items
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let pending = ""
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    pending += decoder.decode(value, { stream: true })
+    const lines = pending.split("\n")
+    pending = lines.pop() ?? ""
+    lines.forEach(pushLine)
+  }
+  pushLine(pending + decoder.decode())
+  return items
+}
+
 export async function getPatients(): Promise<Patient[]> {
-  return fetchJson<Patient[]>("/api/patients/")
+  return fetchNdjson<Patient>("/api/patients/ndjson/")
 }
 
 export async function getPatientById(patientId: string): Promise<Patient | null> {
@@ -8,8 +8,10 @@ Key material is derived from Django SECRET_KEY; do not commit production SECRET_
 """
 import base64
 import hashlib
-import json
 import os
+from functools import lru_cache
+
+import orjson
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
@@ -23,49 +25,72 @@ def _get_aes256_key() -> bytes:
     return hashlib.sha256(key).digest()
 
 
+@lru_cache(maxsize=4)
+def _aesgcm_for(key: bytes) -> AESGCM:
+    return AESGCM(key)
+
+
+def _encrypt_bytes(data: bytes) -> str:
+    nonce = os.urandom(12)
+    ct = _aesgcm_for(_get_aes256_key()).encrypt(nonce, data, None)
+    return base64.urlsafe_b64encode(nonce + ct).decode("ascii")
+
+
 def encrypt_value(plain: str) -> str:
     """Encrypt a string with AES-256-GCM. Returns base64(nonce || ciphertext_with_tag)."""
     if not plain:
         return ""
-    key = _get_aes256_key()
-    aesgcm = AESGCM(key)
-    nonce = os.urandom(12)
-    ct = aesgcm.encrypt(nonce, plain.encode("utf-8"), None)
-    return base64.urlsafe_b64encode(nonce + ct).decode("ascii")
+    return _encrypt_bytes(plain.encode("utf-8"))
+
+
+# Ciphertext -> plaintext is deterministic for a given key, and every write
+# produces a fresh ciphertext (random nonce), so entries never go stale.
+@lru_cache(maxsize=4096)
+def _decrypt_cached(key: bytes, cipher: str) -> str:
+    raw = base64.urlsafe_b64decode(cipher.encode("ascii"))
+    nonce, ct_and_tag = raw[:12], raw[12:]
+    return _aesgcm_for(key).decrypt(nonce, ct_and_tag, None).decode("utf-8")
 
 
 def decrypt_value(cipher: str) -> str:
     """Decrypt a string encrypted with encrypt_value (AES-256-GCM)."""
     if not cipher:
         return ""
-    key = _get_aes256_key()
-    aesgcm = AESGCM(key)
-    raw = base64.urlsafe_b64decode(cipher.encode("ascii"))
-    nonce, ct_and_tag = raw[:12], raw[12:]
-    return aesgcm.decrypt(nonce, ct_and_tag, None).decode("utf-8")
+    return _decrypt_cached(_get_aes256_key(), cipher)
 
 
 def encrypt_json(data: dict | list) -> str:
     """Encrypt a dict or list as JSON with AES-256-GCM."""
     if not data:
         return encrypt_value("{}")
-    return encrypt_value(json.dumps(data, ensure_ascii=False))
+    # orjson emits UTF-8 bytes directly; non-str keys are stringified like json.dumps.
+    return _encrypt_bytes(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
 
 
 def decrypt_json(cipher: str) -> dict | list:
     """Decrypt and parse JSON (dict or list)."""
     if not cipher:
         return {} if isinstance(cipher, str) else []
-    plain = decrypt_value(cipher)
+    return parse_json_plain(decrypt_value(cipher))
+
+
+def parse_json_plain(plain: str) -> dict | list:
+    """Parse decrypted JSON text; anything but a dict or list becomes {}."""
     if not plain or plain == "{}":
         return {}
     try:
-        out = json.loads(plain)
+        out = orjson.loads(plain)
         return out if isinstance(out, (dict, list)) else {}
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         return {}
 
 
+def decrypt_many(ciphers: list[str]) -> list[str]:
+    """Decrypt several encrypt_value ciphertexts, deriving the key only once."""
+    key = _get_aes256_key()
+    return [_decrypt_cached(key, cipher) if cipher else "" for cipher in ciphers]
+
+
 # ---- Fernet (for UserProfile backward compatibility) ----
 
 def get_fernet():
@@ -76,11 +101,14 @@ def get_fernet():
     return Fernet(b64)
 
 
-def decrypt_value_fernet(cipher: str) -> str:
-    """Decrypt legacy Fernet ciphertext (UserProfile)."""
+def decrypt_value_fernet(cipher: str, fernet=None) -> str:
+    """
+    Decrypt legacy Fernet ciphertext (UserProfile). Pass fernet to reuse one
+    instance across many values instead of rebuilding it per call.
+    """
     if not cipher:
         return ""
-    f = get_fernet()
+    f = fernet or get_fernet()
     return f.decrypt(cipher.encode("ascii")).decode("utf-8")
 
 
@@ -1,8 +1,22 @@
 """
 User profile keyed by NFC user_id. Sensitive fields stored encrypted in SQLite.
 """
+import copy
+
 from django.db import models
 
+from .encryption import (
+    decrypt_json,
+    decrypt_many,
+    decrypt_value,
+    decrypt_value_fernet,
+    encrypt_json,
+    encrypt_value,
+    encrypt_value_fernet,
+    get_fernet,
+    parse_json_plain,
+)
+
 
 class UserProfile(models.Model):
     """
@@ -19,6 +33,10 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    _ENC_FIELDS = ("_first_name", "_last_name", "_email", "_phone", "_notes")
+    # Columns needed to build the API payload without hydrating model instances.
+    API_VALUE_FIELDS = ("user_id", *_ENC_FIELDS, "created_at", "updated_at")
+
     class Meta:
         ordering = ["user_id"]
         verbose_name = "User (NFC)"
@@ -29,52 +47,42 @@ class UserProfile(models.Model):
 
     @property
     def first_name(self):
-        from .encryption import decrypt_value_fernet
         return decrypt_value_fernet(self._first_name) if self._first_name else ""
 
     @first_name.setter
     def first_name(self, value):
-        from .encryption import encrypt_value_fernet
         self._first_name = encrypt_value_fernet((value or "").strip())
 
     @property
     def last_name(self):
-        from .encryption import decrypt_value_fernet
         return decrypt_value_fernet(self._last_name) if self._last_name else ""
 
     @last_name.setter
     def last_name(self, value):
-        from .encryption import encrypt_value_fernet
         self._last_name = encrypt_value_fernet((value or "").strip())
 
     @property
     def email(self):
-        from .encryption import decrypt_value_fernet
         return decrypt_value_fernet(self._email) if self._email else ""
 
     @email.setter
     def email(self, value):
-        from .encryption import encrypt_value_fernet
         self._email = encrypt_value_fernet((value or "").strip())
 
     @property
     def phone(self):
-        from .encryption import decrypt_value_fernet
         return decrypt_value_fernet(self._phone) if self._phone else ""
 
     @phone.setter
     def phone(self, value):
-        from .encryption import encrypt_value_fernet
         self._phone = encrypt_value_fernet((value or "").strip())
 
     @property
     def notes(self):
-        from .encryption import decrypt_value_fernet
         return decrypt_value_fernet(self._notes) if self._notes else ""
 
     @notes.setter
     def notes(self, value):
-        from .encryption import encrypt_value_fernet
         self._notes = encrypt_value_fernet((value or "").strip())
 
     def set_plain_fields(self, first_name="", last_name="", email="", phone="", notes=""):
@@ -85,15 +93,27 @@ class UserProfile(models.Model):
         self.notes = notes
 
     def to_api_dict(self):
+        values = {name: getattr(self, name) for name in self.API_VALUE_FIELDS}
+        return self._build_api_dict(values, get_fernet())
+
+    @classmethod
+    def api_dicts_from_values(cls, rows):
+        """Build to_api_dict() payloads from .values(*API_VALUE_FIELDS) rows."""
+        f = get_fernet()
+        return [cls._build_api_dict(row, f) for row in rows]
+
+    @classmethod
+    def _build_api_dict(cls, values, fernet):
+        c = {name: decrypt_value_fernet(values[name], fernet) for name in cls._ENC_FIELDS}
         return {
-            "userId": self.user_id,
-            "firstName": self.first_name,
-            "lastName": self.last_name,
-            "email": self.email,
-            "phone": self.phone,
-            "notes": self.notes,
-            "createdAt": self.created_at.isoformat() if self.created_at else None,
-            "updatedAt": self.updated_at.isoformat() if self.updated_at else None,
+            "userId": values["user_id"],
+            "firstName": c["_first_name"],
+            "lastName": c["_last_name"],
+            "email": c["_email"],
+            "phone": c["_phone"],
+            "notes": c["_notes"],
+            "createdAt": values["created_at"].isoformat() if values["created_at"] else None,
+            "updatedAt": values["updated_at"].isoformat() if values["updated_at"] else None,
         }
 
 
@@ -131,6 +151,53 @@ class Patient(models.Model):
     _historical_heart_rate = models.TextField(blank=True, default="")
     _historical_body_weight = models.TextField(blank=True, default="")
     _family_history = models.TextField(blank=True, default="")
+    # Bumped on every save; drives ETags and response caching.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Encrypted columns holding plain strings vs JSON (with the getter's default type).
+    _ENC_TEXT_FIELDS = (
+        "_first_name",
+        "_last_name",
+        "_date_of_birth",
+        "_gender",
+        "_blood_type",
+        "_room",
+        "_admission_date",
+        "_primary_diagnosis",
+        "_insurance_provider",
+        "_insurance_id",
+        "_alberta_health_card_number",
+        "_important_test_results",
+    )
+    _ENC_JSON_FIELDS = {
+        "_emergency_contact": dict,
+        "_allergies": list,
+        "_medications": list,
+        "_current_prescriptions": list,
+        "_medical_history": list,
+        "_past_medical_history": list,
+        "_notes": list,
+        "_historical_blood_pressure": list,
+        "_historical_heart_rate": list,
+        "_historical_body_weight": list,
+        "_family_history": list,
+    }
+    # Columns needed to build the API payload without hydrating model instances.
+    API_VALUE_FIELDS = (
+        "id",
+        "nfc_id",
+        "status",
+        "use_alberta_health_card",
+        *_ENC_TEXT_FIELDS,
+        *_ENC_JSON_FIELDS,
+    )
+    # Public field name (as set via the properties) -> column it is stored in,
+    # for building save(update_fields=...) lists.
+    FIELD_COLUMNS = {
+        "status": "status",
+        "use_alberta_health_card": "use_alberta_health_card",
+        **{column[1:]: column for column in (*_ENC_TEXT_FIELDS, *_ENC_JSON_FIELDS)},
+    }
 
     class Meta:
         ordering = ["id"]
@@ -138,34 +205,108 @@ class Patient(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.nfc_id})"
 
+    def __getstate__(self):
+        # Never pickle decrypted plaintext along with the instance.
+        state = super().__getstate__()
+        state.pop("_dec_cache", None)
+        return state
+
     # ---- Encrypted properties (AES-256-GCM) ----
+    # Decrypted values are memoized per instance in _dec_cache as
+    # name -> (ciphertext, value). The ciphertext is kept so a raw column
+    # reassigned behind the property (e.g. refresh_from_db) is not served stale.
+    def _cached_dec(self, name, raw):
+        cache = self.__dict__.get("_dec_cache")
+        if cache is None:
+            return None
+        hit = cache.get(name)
+        if hit is not None and hit[0] == raw:
+            return hit
+        return None
+
+    def _store_dec(self, name, raw, value):
+        self.__dict__.setdefault("_dec_cache", {})[name] = (raw, value)
+        return value
+
     def _get_enc(self, name):
-        from .encryption import decrypt_value
         val = getattr(self, name, None)
-        return decrypt_value(val) if val else ""
+        if not val:
+            return ""
+        hit = self._cached_dec(name, val)
+        if hit is not None:
+            return hit[1]
+        return self._store_dec(name, val, decrypt_value(val))
 
     def _set_enc(self, name, value):
-        from .encryption import encrypt_value
+        self.__dict__.get("_dec_cache", {}).pop(name, None)
         setattr(self, name, encrypt_value((value or "").strip()))
 
-    def _get_json(self, name, default=None):
-        from .encryption import decrypt_json
-        val = getattr(self, name, None)
-        if not val:
-            return default if default is not None else {}
-        out = decrypt_json(val)
+    @staticmethod
+    def _coerce_json(out, default=None):
         if out is None:
             return default if default is not None else {}
         if default is not None and type(out) is not type(default):
             return default
         return out
 
+    @staticmethod
+    def _json_copy(value):
+        # Callers get a deep copy: mutating it in place (without the setter),
+        # nested entries included, must not alter the cached plaintext behind
+        # the unchanged ciphertext.
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+    def _get_json(self, name, default=None):
+        val = getattr(self, name, None)
+        if not val:
+            return default if default is not None else {}
+        hit = self._cached_dec(name, val)
+        if hit is not None:
+            return self._json_copy(hit[1])
+        value = self._store_dec(name, val, self._coerce_json(decrypt_json(val), default))
+        return self._json_copy(value)
+
     def _set_json(self, name, value):
-        from .encryption import encrypt_json
+        self.__dict__.get("_dec_cache", {}).pop(name, None)
         if value is None:
             value = {} if "contact" in name else []
         setattr(self, name, encrypt_json(value) if value else "")
 
+    def bulk_decrypt(self):
+        """
+        Decrypt every loaded, not-yet-cached encrypted column with a single
+        AES-GCM context and fill _dec_cache. Deferred columns are left alone.
+        """
+        loaded = self.__dict__
+        names = [
+            name
+            for name in (*self._ENC_TEXT_FIELDS, *self._ENC_JSON_FIELDS)
+            if loaded.get(name) and self._cached_dec(name, loaded[name]) is None
+        ]
+        if not names:
+            return
+        plains = decrypt_many([loaded[name] for name in names])
+        for name, plain in zip(names, plains):
+            self._store_dec(name, loaded[name], self._decode_plain(name, plain))
+
+    @classmethod
+    def _decode_plain(cls, name, plain):
+        factory = cls._ENC_JSON_FIELDS.get(name)
+        if factory is None:
+            return plain
+        return cls._coerce_json(parse_json_plain(plain), factory())
+
+    @classmethod
+    def _decrypt_columns(cls, values):
+        """Plaintext map (with empty defaults) for the encrypted columns of a .values() row."""
+        plain = dict.fromkeys(cls._ENC_TEXT_FIELDS, "")
+        for name, factory in cls._ENC_JSON_FIELDS.items():
+            plain[name] = factory()
+        present = [name for name in plain if values.get(name)]
+        for name, text in zip(present, decrypt_many([values[name] for name in present])):
+            plain[name] = cls._decode_plain(name, text)
+        return plain
+
     @property
     def first_name(self):
         return self._get_enc("_first_name")
@@ -350,33 +491,71 @@ class Patient(models.Model):
     def family_history(self, value):
         self._set_json("_family_history", value if isinstance(value, list) else [])
 
+    def _plain_fields(self):
+        """
+        Return {encrypted column: plaintext or empty default} for every encrypted
+        column, loading any deferred ones in one query and decrypting in one pass.
+        """
+        deferred = self.get_deferred_fields().intersection(
+            (*self._ENC_TEXT_FIELDS, *self._ENC_JSON_FIELDS)
+        )
+        if deferred:
+            self.refresh_from_db(fields=sorted(deferred))
+        self.bulk_decrypt()
+        loaded = self.__dict__
+        cache = loaded.get("_dec_cache", {})
+        plain = {}
+        for name in self._ENC_TEXT_FIELDS:
+            plain[name] = cache[name][1] if loaded.get(name) else ""
+        for name, factory in self._ENC_JSON_FIELDS.items():
+            plain[name] = self._json_copy(cache[name][1]) if loaded.get(name) else factory()
+        return plain
+
     def to_api_dict(self):
-        return {
+        # Read decrypted values straight from one plaintext map instead of going
+        # through ~23 property descriptors.
+        c = self._plain_fields()
+        values = {
             "id": self.id,
-            "firstName": self.first_name,
-            "lastName": self.last_name,
-            "dateOfBirth": self.date_of_birth,
-            "gender": self.gender,
-            "bloodType": self.blood_type,
-            "nfcId": self.nfc_id,
+            "nfc_id": self.nfc_id,
             "status": self.status,
-            "room": self.room,
-            "admissionDate": self.admission_date,
-            "allergies": self.allergies or [],
-            "primaryDiagnosis": self.primary_diagnosis,
-            "insuranceProvider": self.insurance_provider or "",
-            "insuranceId": self.insurance_id or "",
-            "useAlbertaHealthCard": self.use_alberta_health_card,
-            "albertaHealthCardNumber": self.alberta_health_card_number or "",
-            "emergencyContact": self.emergency_contact or {},
-            "medications": self.medications or [],
-            "currentPrescriptions": self.current_prescriptions or [],
-            "medicalHistory": self.medical_history or [],
-            "pastMedicalHistory": self.past_medical_history or [],
-            "importantTestResults": self.important_test_results or "",
-            "notes": self.notes or [],
-            "historicalBloodPressure": self.historical_blood_pressure or [],
-            "historicalHeartRate": self.historical_heart_rate or [],
-            "historicalBodyWeight": self.historical_body_weight or [],
-            "familyHistory": self.family_history or [],
+            "use_alberta_health_card": self.use_alberta_health_card,
+        }
+        return self._build_api_dict(values, c)
+
+    @classmethod
+    def api_dicts_from_values(cls, rows):
+        """Build to_api_dict() payloads from .values(*API_VALUE_FIELDS) rows."""
+        return [cls._build_api_dict(row, cls._decrypt_columns(row)) for row in rows]
+
+    @staticmethod
+    def _build_api_dict(values, c):
+        return {
+            "id": values["id"],
+            "firstName": c["_first_name"],
+            "lastName": c["_last_name"],
+            "dateOfBirth": c["_date_of_birth"],
+            "gender": c["_gender"],
+            "bloodType": c["_blood_type"],
+            "nfcId": values["nfc_id"],
+            "status": values["status"],
+            "room": c["_room"],
+            "admissionDate": c["_admission_date"],
+            "allergies": c["_allergies"],
+            "primaryDiagnosis": c["_primary_diagnosis"],
+            "insuranceProvider": c["_insurance_provider"],
+            "insuranceId": c["_insurance_id"],
+            "useAlbertaHealthCard": values["use_alberta_health_card"],
+            "albertaHealthCardNumber": c["_alberta_health_card_number"],
+            "emergencyContact": c["_emergency_contact"],
+            "medications": c["_medications"],
+            "currentPrescriptions": c["_current_prescriptions"],
+            "medicalHistory": c["_medical_history"],
+            "pastMedicalHistory": c["_past_medical_history"],
+            "importantTestResults": c["_important_test_results"],
+            "notes": c["_notes"],
+            "historicalBloodPressure": c["_historical_blood_pressure"],
+            "historicalHeartRate": c["_historical_heart_rate"],
+            "historicalBodyWeight": c["_historical_body_weight"],
+            "familyHistory": c["_family_history"],
         }
@@ -1,4 +1,3 @@
-from django.http import JsonResponse
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -16,9 +15,11 @@ def patient_detail(request, patient_id: str):
 
 urlpatterns = [
     path("", views.patient_list),
+    path("ndjson/", views.patient_list_ndjson),
     path("create/", views.patient_create),
     path("ai-overview/", views.patient_ai_overview),
     path("risk-score/", views.patient_risk_score),
+    path("risk-score-batch/", views.patient_risk_score_batch),
     path("by-nfc/<str:nfc_id>/", views.patient_by_nfc),
     path("<str:patient_id>/", patient_detail),
 ]
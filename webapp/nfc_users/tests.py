@@ -1,7 +1,11 @@
-import json
+import orjson
+from datetime import date
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 
 from nfc_users.ai_overview import AiOverviewError
 from nfc_users.models import Patient
@@ -42,6 +46,9 @@ def _create_patient(
 
 
 class RiskApiFlowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_nfc_scan_then_risk_score(self):
         patient = _create_patient(
             patient_id="FLOW-001",
@@ -53,7 +60,7 @@ class RiskApiFlowTests(TestCase):
 
         scan_resp = client.post(
             "/api/nfc/scan/",
-            data=json.dumps({"tag_id": patient.nfc_id}),
+            data=orjson.dumps({"tag_id": patient.nfc_id}),
             content_type="application/json",
         )
         self.assertEqual(scan_resp.status_code, 200)
@@ -62,7 +69,7 @@ class RiskApiFlowTests(TestCase):
 
         risk_resp = client.post(
             "/api/patients/risk-score/",
-            data=json.dumps({"patient_id": patient.id}),
+            data=orjson.dumps({"patient_id": patient.id}),
             content_type="application/json",
         )
         self.assertEqual(risk_resp.status_code, 200)
@@ -89,7 +96,7 @@ class RiskApiFlowTests(TestCase):
         with patch("nfc_users.views.generate_ai_overview", return_value="LLM summary text.") as mocked:
             overview_resp = client.post(
                 "/api/patients/ai-overview/",
-                data=json.dumps({"patient_id": patient.id}),
+                data=orjson.dumps({"patient_id": patient.id}),
                 content_type="application/json",
             )
 
@@ -115,7 +122,7 @@ class RiskApiFlowTests(TestCase):
         ):
             overview_resp = client.post(
                 "/api/patients/ai-overview/",
-                data=json.dumps({"patient_id": patient.id}),
+                data=orjson.dumps({"patient_id": patient.id}),
                 content_type="application/json",
             )
 
@@ -123,3 +130,292 @@ class RiskApiFlowTests(TestCase):
         body = overview_resp.json()
         self.assertEqual(body.get("source"), "fallback")
         self.assertTrue(isinstance(body.get("overview"), str) and body.get("overview", "").strip())
+
+    def test_ai_overview_is_cached_until_patient_changes(self):
+        patient = _create_patient(
+            patient_id="FLOW-004",
+            nfc_id="FLOW-004",
+            admission_date="2026-02-10",
+            status="active",
+        )
+        client = Client()
+        payload = orjson.dumps({"patient_id": patient.id})
+
+        with patch("nfc_users.views.generate_ai_overview", return_value="Summary.") as mocked:
+            for _ in range(2):
+                resp = client.post("/api/patients/ai-overview/", data=payload, content_type="application/json")
+                self.assertEqual(resp.json(), {"overview": "Summary."})
+            self.assertEqual(mocked.call_count, 1)
+
+            patient.room = "B-202"
+            patient.save()
+            client.post("/api/patients/ai-overview/", data=payload, content_type="application/json")
+            self.assertEqual(mocked.call_count, 2)
+
+
+class PatientDecryptCacheTests(TestCase):
+    def test_setter_and_refresh_invalidate_cached_plaintext(self):
+        patient = _create_patient(
+            patient_id="CACHE-001",
+            nfc_id="CACHE-001",
+            admission_date="2026-02-10",
+        )
+        self.assertEqual(patient.first_name, "Test")
+        self.assertEqual(patient.medications, ["med-a"])
+
+        patient.first_name = "Changed"
+        patient.medications = ["med-b"]
+        self.assertEqual(patient.first_name, "Changed")
+        self.assertEqual(patient.medications, ["med-b"])
+
+        patient.refresh_from_db()
+        self.assertEqual(patient.first_name, "Test")
+        self.assertEqual(patient.medications, ["med-a"])
+        self.assertNotIn("_dec_cache", patient.__getstate__())
+
+    def test_in_place_mutation_does_not_leak_into_cache(self):
+        patient = _create_patient(
+            patient_id="CACHE-002",
+            nfc_id="CACHE-002",
+            admission_date="2026-02-10",
+        )
+        patient.historical_heart_rate = [{"date": "2026-02-10", "value": 72}]
+        patient.save()
+
+        patient.medications.append("unsaved")
+        patient.to_api_dict()["medications"].append("unsaved")
+        patient.historical_heart_rate[0]["value"] = 999
+        patient.to_api_dict()["historicalHeartRate"][0]["value"] = 999
+        self.assertEqual(patient.medications, ["med-a"])
+        self.assertEqual(patient.to_api_dict()["medications"], ["med-a"])
+        self.assertEqual(patient.historical_heart_rate, [{"date": "2026-02-10", "value": 72}])
+        self.assertEqual(
+            patient.to_api_dict()["historicalHeartRate"], [{"date": "2026-02-10", "value": 72}]
+        )
+
+
+class ConditionalGetTests(TestCase):
+    def test_patient_detail_returns_304_until_patient_changes(self):
+        patient = _create_patient(
+            patient_id="ETAG-001",
+            nfc_id="ETAG-001",
+            admission_date="2026-02-10",
+        )
+        client = Client()
+
+        first = client.get(f"/api/patients/{patient.id}/")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        self.assertIn("must-revalidate", first["Cache-Control"])
+
+        cached = client.get(f"/api/patients/{patient.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        client.patch(
+            f"/api/patients/{patient.id}/",
+            data=orjson.dumps({"firstName": "Renamed", "lastName": "Patient"}),
+            content_type="application/json",
+        )
+        changed = client.get(f"/api/patients/{patient.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json().get("firstName"), "Renamed")
+
+    def test_nfc_scan_embeds_cached_patient_payload(self):
+        patient = _create_patient(
+            patient_id="SCAN-001",
+            nfc_id="SCAN-TAG-001",
+            admission_date="2026-02-10",
+        )
+        client = Client()
+
+        detail = client.get(f"/api/patients/{patient.id}/").json()
+        scan = client.post(
+            "/api/nfc/scan/",
+            data=orjson.dumps({"tag_id": "SCAN-TAG-001"}),
+            content_type="application/json",
+        )
+        self.assertEqual(scan.status_code, 200)
+        self.assertEqual(scan.json(), {"mode": "nfc-tag", "patient": detail})
+
+
+class CreateConflictTests(TestCase):
+    def test_duplicate_nfc_tag_returns_409(self):
+        client = Client()
+        payload = orjson.dumps({"nfcId": "DUP-001", "firstName": "Ada", "lastName": "Lovelace"})
+
+        created = client.post("/api/patients/create/", data=payload, content_type="application/json")
+        self.assertEqual(created.status_code, 201)
+        duplicate = client.post("/api/patients/create/", data=payload, content_type="application/json")
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(Patient.objects.filter(nfc_id="DUP-001").count(), 1)
+
+    def test_empty_camel_case_value_falls_back_to_snake_case(self):
+        response = Client().post(
+            "/api/patients/create/",
+            data=orjson.dumps(
+                {"nfc_id": "N10", "nfcId": "", "first_name": "Ada", "firstName": "", "lastName": "Lovelace"}
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Patient.objects.get(pk="N10").first_name, "Ada")
+
+
+class RiskScoreBatchTests(TestCase):
+    def test_batch_matches_single_endpoint_and_skips_unknown_ids(self):
+        patient = _create_patient(
+            patient_id="BATCH-001",
+            nfc_id="BATCH-001",
+            admission_date="2026-02-10",
+        )
+        client = Client()
+
+        single = client.post(
+            "/api/patients/risk-score/",
+            data=orjson.dumps({"patient_id": patient.id}),
+            content_type="application/json",
+        )
+        batch = client.post(
+            "/api/patients/risk-score-batch/",
+            data=orjson.dumps({"patient_ids": [patient.id, "MISSING-001"]}),
+            content_type="application/json",
+        )
+        self.assertEqual(batch.status_code, 200)
+        self.assertEqual(batch.json(), {patient.id: single.json()})
+
+    def test_multi_patient_batch_matches_single_scores(self):
+        patients = [
+            _create_patient(
+                patient_id=f"BATCH-{idx}",
+                nfc_id=f"BATCH-{idx}",
+                admission_date=admission_date,
+                status=status,
+            )
+            for idx, (status, admission_date) in enumerate(
+                [("critical", "2025-01-10"), ("discharged", "2026-02-10"), ("active", "2025-10-01")]
+            )
+        ]
+        client = Client()
+
+        batch = client.post(
+            "/api/patients/risk-score-batch/",
+            data=orjson.dumps({"patient_ids": [p.id for p in patients]}),
+            content_type="application/json",
+        ).json()
+        for patient in patients:
+            single = client.post(
+                "/api/patients/risk-score/",
+                data=orjson.dumps({"patient_id": patient.id}),
+                content_type="application/json",
+            )
+            self.assertEqual(batch[patient.id], single.json())
+
+    def test_batch_rejects_more_than_the_id_cap(self):
+        client = Client()
+        for count, status in ((500, 200), (501, 400)):
+            response = client.post(
+                "/api/patients/risk-score-batch/",
+                data=orjson.dumps({"patient_ids": [f"CAP-{i}" for i in range(count)]}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, status)
+
+    def test_heuristic_baseline_factor_reports_adjusted_score(self):
+        today = date.today().isoformat()
+        discharged = _create_patient(
+            patient_id="BATCH-DIS",
+            nfc_id="BATCH-DIS",
+            admission_date=today,
+            status="discharged",
+        )
+        active = _create_patient(
+            patient_id="BATCH-ACT",
+            nfc_id="BATCH-ACT",
+            admission_date=today,
+        )
+        client = Client()
+
+        with patch(
+            "risk_scoring.service.RiskScoringService._load_latest_model_payload",
+            return_value=None,
+        ):
+            batch = client.post(
+                "/api/patients/risk-score-batch/",
+                data=orjson.dumps({"patient_ids": [discharged.id, active.id]}),
+                content_type="application/json",
+            ).json()
+            single = client.post(
+                "/api/patients/risk-score/",
+                data=orjson.dumps({"patient_id": discharged.id}),
+                content_type="application/json",
+            ).json()
+
+        # No rule fires, so the only base factor is the discharge-adjusted score.
+        self.assertEqual(
+            single["topFactors"][0],
+            {"feature": "baseline_risk", "direction": "up", "contribution": 0.048},
+        )
+        self.assertEqual(batch[discharged.id], single)
+
+
+class PatientNdjsonTests(TestCase):
+    def test_ndjson_stream_matches_list_endpoint(self):
+        _create_patient(
+            patient_id="NDJSON-001",
+            nfc_id="NDJSON-001",
+            admission_date="2026-02-10",
+        )
+        client = Client()
+
+        listed = client.get("/api/patients/").json()
+        streamed = client.get("/api/patients/ndjson/")
+        self.assertEqual(streamed["Content-Type"], "application/x-ndjson")
+        lines = b"".join(streamed.streaming_content).splitlines()
+        self.assertEqual([orjson.loads(line) for line in lines], listed)
+
+        cached = client.get("/api/patients/ndjson/", HTTP_IF_NONE_MATCH=streamed["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+
+class PatientUpdateTests(TestCase):
+    def test_patch_leaves_omitted_history_columns_untouched(self):
+        patient = _create_patient(
+            patient_id="PATCH-001",
+            nfc_id="PATCH-001",
+            admission_date="2026-02-10",
+        )
+        patient.historical_heart_rate = [{"date": "2026-02-10", "value": 72}]
+        patient.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().patch(
+                f"/api/patients/{patient.id}/",
+                data=orjson.dumps({"firstName": "Renamed", "lastName": "Patient"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        update_sql = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(update_sql), 1)
+        self.assertNotIn("_historical_heart_rate", update_sql[0])
+
+        patient.refresh_from_db()
+        self.assertEqual(patient.first_name, "Renamed")
+        self.assertEqual(patient.historical_heart_rate, [{"date": "2026-02-10", "value": 72}])
+
+    def test_patch_with_unchanged_values_skips_the_write(self):
+        patient = _create_patient(
+            patient_id="PATCH-002",
+            nfc_id="PATCH-002",
+            admission_date="2026-02-10",
+        )
+        current = Client().get(f"/api/patients/{patient.id}/").json()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().patch(
+                f"/api/patients/{patient.id}/",
+                data=orjson.dumps(current),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), current)
+        self.assertFalse(any(q["sql"].startswith("UPDATE") for q in queries.captured_queries))
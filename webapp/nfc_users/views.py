@@ -1,52 +1,139 @@
 """
 REST API for NFC user lookup, create, and Patient API for React frontend.
 """
-import json
-from django.http import JsonResponse
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+import orjson
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.http import (
+    condition,
+    require_GET,
+    require_POST,
+    require_http_methods,
+)
+from config.responses import ORJSON_OPTIONS, ORJSONResponse
+from risk_scoring.service import RiskScoringService
 
 from .ai_overview import AiOverviewError, build_fallback_overview, generate_ai_overview
 from .models import UserProfile, Patient
 
 
+# Error detail templates, interpolated with the offending key at emit time.
+USER_NOT_FOUND = "No user found for ID '%s'."
+USER_EXISTS = "A user with ID '%s' already exists."
+PATIENT_NOT_FOUND = "Patient '%s' not found."
+NFC_TAG_NOT_FOUND = "No patient mapped to NFC tag '%s'."
+NFC_TAG_TAKEN = "A patient is already linked to NFC tag '%s'."
+
+
+def _detail_response(template, key, status):
+    return ORJSONResponse({"detail": template % (key,)}, status=status)
+
+
+def _not_found(template, key):
+    return _detail_response(template, key, status=404)
+
+
+def _parse_json_body(request, detail="Invalid JSON."):
+    """
+    Decode a JSON object request body. Returns (body, None) on success or
+    (None, 400 response) when the body is not valid JSON or not an object.
+    An empty body decodes to {}.
+    """
+    if not request.body:
+        return {}, None
+    try:
+        body = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return None, ORJSONResponse({"detail": detail}, status=400)
+    if not isinstance(body, dict):
+        return None, ORJSONResponse({"detail": "JSON body must be an object."}, status=400)
+    return body, None
+
+
 def _get_user_json(profile):
     return profile.to_api_dict()
 
 
+def _weak_etag(*parts):
+    return 'W/"%s"' % "-".join(str(p) for p in parts)
+
+
+def _updated_at_etag(queryset):
+    # Rows never saved since the updated_at backfill share one timestamp, so
+    # the (percent-encoded) pk keeps their tags distinct.
+    row = queryset.values_list("pk", "updated_at").first()
+    if row is None or row[1] is None:
+        return None
+    pk, ts = row
+    return _weak_etag(quote(str(pk), safe=""), ts.timestamp())
+
+
+def _list_etag(model, pk_field):
+    agg = model.objects.aggregate(last=Max("updated_at"), n=Count(pk_field))
+    return _weak_etag(agg["n"], agg["last"].timestamp() if agg["last"] else 0)
+
+
+def _user_etag(request, user_id):
+    return _updated_at_etag(UserProfile.objects.filter(user_id=user_id.strip()))
+
+
+def _user_list_etag(request):
+    return _list_etag(UserProfile, "user_id")
+
+
+def _patient_etag(request, patient_id):
+    return _updated_at_etag(Patient.objects.filter(pk=patient_id.strip()))
+
+
+def _patient_nfc_etag(request, nfc_id):
+    return _updated_at_etag(Patient.objects.filter(nfc_id=nfc_id.strip()))
+
+
+def _patient_list_etag(request):
+    return _list_etag(Patient, "id")
+
+
+# Clients may keep a copy but must revalidate it with If-None-Match each time.
+_revalidate = cache_control(private=True, max_age=0, must_revalidate=True)
+
+
 def _as_string_list(value):
     if value is None:
         return []
     if isinstance(value, list):
-        out = []
-        for item in value:
-            s = str(item).strip()
-            if s and s not in out:
-                out.append(s)
-        return out
+        # dict.fromkeys de-duplicates in O(n) while keeping first-seen order.
+        return list(dict.fromkeys(s for s in (str(item).strip() for item in value) if s))
     s = str(value).strip()
     return [s] if s else []
 
 
 @require_GET
+@_revalidate
+@condition(etag_func=_user_etag)
 def user_by_id(request, user_id: str):
     """GET /api/users/<user_id>/ – Look up user by NFC user_id."""
-    try:
-        profile = UserProfile.objects.get(user_id=user_id.strip())
-    except UserProfile.DoesNotExist:
-        return JsonResponse(
-            {"detail": f"No user found for ID '{user_id}'."},
-            status=404,
-        )
-    return JsonResponse(_get_user_json(profile))
+    profile = UserProfile.objects.filter(user_id=user_id.strip()).first()
+    if profile is None:
+        return _not_found(USER_NOT_FOUND, user_id)
+    return ORJSONResponse(_get_user_json(profile))
 
 
 @require_GET
+@_revalidate
+@condition(etag_func=_user_list_etag)
 def user_list(request):
     """GET /api/users/ – List all users (user_id only for privacy, or full if needed)."""
-    profiles = UserProfile.objects.all().order_by("user_id")
-    return JsonResponse({
-        "users": [p.to_api_dict() for p in profiles],
+    rows = UserProfile.objects.order_by("user_id").values(*UserProfile.API_VALUE_FIELDS)
+    return ORJSONResponse({
+        "users": UserProfile.api_dicts_from_values(rows),
     })
 
 
@@ -57,20 +144,13 @@ def user_create(request):
     POST /api/users/ – Create a user.
     Body: JSON with userId (required), firstName, lastName, email, phone, notes.
     """
-    try:
-        body = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
 
     user_id = (body.get("userId") or "").strip()[:15]
     if not user_id:
-        return JsonResponse({"detail": "userId is required (max 15 characters)."}, status=400)
-
-    if UserProfile.objects.filter(user_id=user_id).exists():
-        return JsonResponse(
-            {"detail": f"A user with ID '{user_id}' already exists."},
-            status=409,
-        )
+        return ORJSONResponse({"detail": "userId is required (max 15 characters)."}, status=400)
 
     profile = UserProfile(user_id=user_id)
     profile.set_plain_fields(
@@ -80,102 +160,288 @@ def user_create(request):
         phone=body.get("phone", ""),
         notes=body.get("notes", ""),
     )
-    profile.save()
-    return JsonResponse(_get_user_json(profile), status=201)
+    # Single INSERT; the unique constraint on user_id reports duplicates.
+    try:
+        with transaction.atomic():
+            profile.save(force_insert=True)
+    except IntegrityError:
+        return _detail_response(USER_EXISTS, user_id, status=409)
+    return ORJSONResponse(_get_user_json(profile), status=201)
 
 
 # ----- Patient API (React frontend) -----
 
+PATIENT_LIST_FIELDS = Patient.API_VALUE_FIELDS
+
+# Columns read by risk_scoring.features.patient_to_feature_dict; everything else
+# (vitals history, notes, insurance, ...) stays deferred on scoring requests.
+RISK_FEATURE_COLUMNS = (
+    "id",
+    "status",
+    "_date_of_birth",
+    "_gender",
+    "_admission_date",
+    "_primary_diagnosis",
+    "_important_test_results",
+    "_allergies",
+    "_medications",
+    "_current_prescriptions",
+    "_medical_history",
+    "_past_medical_history",
+)
+# The AI overview additionally names the patient; updated_at keys its cache.
+AI_OVERVIEW_COLUMNS = RISK_FEATURE_COLUMNS + ("_first_name", "_last_name", "updated_at")
+# Upper bound on patient_ids per risk-score-batch request.
+RISK_BATCH_MAX_IDS = 500
+
+# Generated overviews are reused until the patient or the risk model changes.
+# After a provider failure, requests skip the LLM and serve the fallback for a
+# short while instead of retrying on every call.
+AI_OVERVIEW_CACHE_TIMEOUT = 24 * 60 * 60
+AI_OVERVIEW_RETRY_AFTER = 60
+_AI_OVERVIEW_DOWN_KEY = "ai_overview:provider_down"
+
+# Serialised Patient.to_api_dict() keyed by (pk, updated_at). Any save bumps
+# updated_at, so stale entries are never hit again and simply age out.
+_API_BYTES_CACHE_SIZE = 2048
+_api_bytes_cache = OrderedDict()
+_api_bytes_lock = threading.Lock()
+
+
+_risk_service = None
+
+
+def _risk():
+    """Process-wide RiskScoringService, built on first use and shared by all requests."""
+    global _risk_service
+    if _risk_service is None:
+        _risk_service = RiskScoringService()
+    return _risk_service
+
+
+def _cached_api_bytes(p):
+    """Return orjson bytes of p.to_api_dict(), reusing them while the row is unchanged."""
+    key = (p.pk, p.updated_at)
+    with _api_bytes_lock:
+        data = _api_bytes_cache.get(key)
+        if data is not None:
+            _api_bytes_cache.move_to_end(key)
+            return data
+    data = orjson.dumps(p.to_api_dict(), option=ORJSON_OPTIONS)
+    with _api_bytes_lock:
+        _api_bytes_cache[key] = data
+        if len(_api_bytes_cache) > _API_BYTES_CACHE_SIZE:
+            _api_bytes_cache.popitem(last=False)
+    return data
+
+
 @require_GET
+@_revalidate
+@condition(etag_func=_patient_list_etag)
 def patient_list(request):
     """GET /api/patients/ – List all patients."""
-    patients = Patient.objects.all().order_by("id")
-    return JsonResponse([p.to_api_dict() for p in patients], safe=False)
+    # .values() skips model instance hydration; rows are decrypted in bulk.
+    rows = Patient.objects.order_by("id").values(*PATIENT_LIST_FIELDS)
+    return ORJSONResponse(Patient.api_dicts_from_values(rows))
+
+
+PATIENT_STREAM_CHUNK_SIZE = 500
+
+
+def _patient_ndjson_lines():
+    rows = Patient.objects.order_by("id").values(*PATIENT_LIST_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=PATIENT_STREAM_CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) == PATIENT_STREAM_CHUNK_SIZE:
+            for item in Patient.api_dicts_from_values(batch):
+                yield orjson.dumps(item, option=ORJSON_OPTIONS) + b"\n"
+            batch = []
+    for item in Patient.api_dicts_from_values(batch):
+        yield orjson.dumps(item, option=ORJSON_OPTIONS) + b"\n"
+
+
+@require_GET
+@_revalidate
+@condition(etag_func=_patient_list_etag)
+def patient_list_ndjson(request):
+    """
+    GET /api/patients/ndjson/ – List all patients as newline-delimited JSON.
+    Rows are read and decrypted in chunks, so memory stays bounded by the chunk
+    size and the first patients are sent before the last ones are loaded.
+    Revalidates with the same ETag as the JSON list.
+    """
+    return StreamingHttpResponse(_patient_ndjson_lines(), content_type="application/x-ndjson")
+
+
+def _strip_or_none(value):
+    return (value or "").strip() or None
+
+
+def _strip_or_empty(value):
+    return (value or "").strip()
+
+
+def _or_empty(value):
+    return value or ""
+
+
+def _or_active(value):
+    return value or "active"
+
+
+def _or_empty_dict(value):
+    return {} if value is None else value
+
+
+def _or_empty_list(value):
+    return [] if value is None else value
+
+
+def _as_is(value):
+    return value
+
+
+# (model field / snake_case key, camelCase key, coercer)
+_PATIENT_FIELDS = (
+    ("first_name", "firstName", _strip_or_none),
+    ("last_name", "lastName", _strip_or_none),
+    ("date_of_birth", "dateOfBirth", _or_empty),
+    ("gender", "gender", _or_empty),
+    ("blood_type", "bloodType", _or_empty),
+    ("status", "status", _or_active),
+    ("room", "room", _or_empty),
+    ("admission_date", "admissionDate", _or_empty),
+    ("primary_diagnosis", "primaryDiagnosis", _or_empty),
+    ("insurance_provider", "insuranceProvider", _or_empty),
+    ("insurance_id", "insuranceId", _or_empty),
+    ("use_alberta_health_card", "useAlbertaHealthCard", _as_is),
+    ("alberta_health_card_number", "albertaHealthCardNumber", _or_empty),
+    ("allergies", "allergies", _as_string_list),
+    ("emergency_contact", "emergencyContact", _or_empty_dict),
+    ("medications", "medications", _or_empty_list),
+    ("current_prescriptions", "currentPrescriptions", _as_string_list),
+    ("medical_history", "medicalHistory", _as_string_list),
+    ("past_medical_history", "pastMedicalHistory", _as_string_list),
+    ("important_test_results", "importantTestResults", _strip_or_empty),
+    ("notes", "notes", _or_empty_list),
+    ("historical_blood_pressure", "historicalBloodPressure", _as_is),
+    ("historical_heart_rate", "historicalHeartRate", _as_is),
+    ("historical_body_weight", "historicalBodyWeight", _as_is),
+    ("family_history", "familyHistory", _as_is),
+)
+_PATIENT_SNAKE_KEYS = frozenset(
+    ("nfc_id", *(field for field, _camel, _coerce in _PATIENT_FIELDS))
+)
+_CAMEL_TO_SNAKE = {
+    "nfcId": "nfc_id",
+    **{camel: field for field, camel, _coerce in _PATIENT_FIELDS if camel != field},
+}
+
+
+def _or_false(value):
+    return value or False
+
+
+def _health_card_number(value):
+    return (value or "").strip()[:32]
+
+
+# Coercions applied by patient_create to everything but id/nfc_id and the name,
+# which it validates itself: the update table, except where creation fills
+# a column default instead of leaving the value untouched.
+_PATIENT_CREATE_OVERRIDES = {
+    "use_alberta_health_card": _or_false,
+    "alberta_health_card_number": _health_card_number,
+    "important_test_results": _or_empty,
+    "historical_blood_pressure": _or_empty_list,
+    "historical_heart_rate": _or_empty_list,
+    "historical_body_weight": _or_empty_list,
+    "family_history": _or_empty_list,
+}
+_PATIENT_CREATE_FIELDS = tuple(
+    (field, _PATIENT_CREATE_OVERRIDES.get(field, coerce))
+    for field, _camel, coerce in _PATIENT_FIELDS
+    if field not in ("first_name", "last_name")
+)
+
+
+def _normalize_patient_body(body, falsy_overrides=True):
+    """
+    Map a JSON body onto snake_case patient field names, dropping unknown keys.
+    A non-None camelCase value wins over its snake_case twin; with
+    falsy_overrides=False only a truthy one does (create's `camel or snake`).
+    """
+    out = {key: value for key, value in body.items() if key in _PATIENT_SNAKE_KEYS}
+    for key, value in body.items():
+        field = _CAMEL_TO_SNAKE.get(key)
+        if field is None or value is None or (not value and not falsy_overrides):
+            continue
+        out[field] = value
+    return out
 
 
 def _patient_api_dict_from_body(body):
     """Build patient field dict from JSON body (camelCase or snake_case)."""
-    def get(key_camel, key_snake=None):
-        k = key_snake or key_camel
-        return body.get(key_camel) if body.get(key_camel) is not None else body.get(k)
-    return {
-        "first_name": (get("firstName", "first_name") or "").strip() or None,
-        "last_name": (get("lastName", "last_name") or "").strip() or None,
-        "date_of_birth": get("dateOfBirth", "date_of_birth") or "",
-        "gender": get("gender") or "",
-        "blood_type": get("bloodType", "blood_type") or "",
-        "status": get("status") or "active",
-        "room": get("room") or "",
-        "admission_date": get("admissionDate", "admission_date") or "",
-        "primary_diagnosis": get("primaryDiagnosis", "primary_diagnosis") or "",
-        "insurance_provider": get("insuranceProvider", "insurance_provider") or "",
-        "insurance_id": get("insuranceId", "insurance_id") or "",
-        "use_alberta_health_card": get("useAlbertaHealthCard", "use_alberta_health_card") if get("useAlbertaHealthCard", "use_alberta_health_card") is not None else None,
-        "alberta_health_card_number": get("albertaHealthCardNumber", "alberta_health_card_number") or "",
-        "allergies": _as_string_list(get("allergies")),
-        "emergency_contact": get("emergencyContact", "emergency_contact") if get("emergencyContact", "emergency_contact") is not None else {},
-        "medications": get("medications") if get("medications") is not None else [],
-        "current_prescriptions": _as_string_list(get("currentPrescriptions", "current_prescriptions")),
-        "medical_history": _as_string_list(get("medicalHistory", "medical_history")),
-        "past_medical_history": _as_string_list(get("pastMedicalHistory", "past_medical_history")),
-        "important_test_results": (get("importantTestResults", "important_test_results") or "").strip(),
-        "notes": get("notes") if get("notes") is not None else [],
-        "historical_blood_pressure": get("historicalBloodPressure", "historical_blood_pressure") if get("historicalBloodPressure", "historical_blood_pressure") is not None else None,
-        "historical_heart_rate": get("historicalHeartRate", "historical_heart_rate") if get("historicalHeartRate", "historical_heart_rate") is not None else None,
-        "historical_body_weight": get("historicalBodyWeight", "historical_body_weight") if get("historicalBodyWeight", "historical_body_weight") is not None else None,
-        "family_history": get("familyHistory", "family_history") if get("familyHistory", "family_history") is not None else None,
-    }
+    get = _normalize_patient_body(body).get
+    return {field: coerce(get(field)) for field, _camel, coerce in _PATIENT_FIELDS}
 
 
 @require_GET
+@_revalidate
+@condition(etag_func=_patient_etag)
 def patient_by_id(request, patient_id: str):
     """GET /api/patients/<id>/ – Get patient by id."""
-    try:
-        p = Patient.objects.get(pk=patient_id.strip())
-    except Patient.DoesNotExist:
-        return JsonResponse(
-            {"detail": f"Patient '{patient_id}' not found."},
-            status=404,
-        )
-    return JsonResponse(p.to_api_dict())
+    p = Patient.objects.filter(pk=patient_id.strip()).first()
+    if p is None:
+        return _not_found(PATIENT_NOT_FOUND, patient_id)
+    return ORJSONResponse(_cached_api_bytes(p))
+
+
+def _apply_patient_update(p, data):
+    """
+    Assign every non-None value in data that differs from the patient's current
+    value and return the columns that changed. Unchanged fields are neither
+    re-encrypted nor written back.
+    """
+    p.bulk_decrypt()
+    columns = Patient.FIELD_COLUMNS
+    changed = []
+    for key, value in data.items():
+        if value is None or getattr(p, key) == value:
+            continue
+        setattr(p, key, value)
+        changed.append(columns[key])
+    return changed
 
 
 @csrf_exempt
 @require_http_methods(["PUT", "PATCH"])
 def patient_update(request, patient_id: str):
     """PUT/PATCH /api/patients/<id>/ – Update patient (full or partial)."""
-    try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
 
-    try:
-        p = Patient.objects.get(pk=patient_id.strip())
-    except Patient.DoesNotExist:
-        return JsonResponse(
-            {"detail": f"Patient '{patient_id}' not found."},
-            status=404,
-        )
+    p = Patient.objects.filter(pk=patient_id.strip()).first()
+    if p is None:
+        return _not_found(PATIENT_NOT_FOUND, patient_id)
 
-    data = _patient_api_dict_from_body(body)
-    for key, value in data.items():
-        if value is not None:
-            setattr(p, key, value)
-    p.save()
-    return JsonResponse(p.to_api_dict())
+    changed = _apply_patient_update(p, _patient_api_dict_from_body(body))
+    if changed:
+        p.save(update_fields=[*changed, "updated_at"])
+    return ORJSONResponse(p.to_api_dict())
 
 
 @require_GET
+@_revalidate
+@condition(etag_func=_patient_nfc_etag)
 def patient_by_nfc(request, nfc_id: str):
     """GET /api/patients/by-nfc/<nfc_id>/ – Get patient by NFC tag id."""
-    try:
-        p = Patient.objects.get(nfc_id=nfc_id.strip())
-    except Patient.DoesNotExist:
-        return JsonResponse(
-            {"detail": f"No patient mapped to NFC tag '{nfc_id}'."},
-            status=404,
-        )
-    return JsonResponse(p.to_api_dict())
+    p = Patient.objects.filter(nfc_id=nfc_id.strip()).first()
+    if p is None:
+        return _not_found(NFC_TAG_NOT_FOUND, nfc_id)
+    return ORJSONResponse(_cached_api_bytes(p))
 
 
 @csrf_exempt
@@ -186,70 +452,37 @@ def patient_create(request):
     Body: JSON with nfcId (required), firstName, lastName (required); optional room, etc.
     Uses nfc_id as patient id. Other fields get sensible defaults.
     """
-    try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
 
-    nfc_id = (body.get("nfcId") or body.get("nfc_id") or "").strip()[:15]
-    first_name = (body.get("firstName") or body.get("first_name") or "").strip()
-    last_name = (body.get("lastName") or body.get("last_name") or "").strip()
+    body = _normalize_patient_body(body, falsy_overrides=False)
+    nfc_id = (body.get("nfc_id") or "").strip()[:15]
+    first_name = (body.get("first_name") or "").strip()
+    last_name = (body.get("last_name") or "").strip()
 
     if not nfc_id:
-        return JsonResponse({"detail": "nfcId is required."}, status=400)
+        return ORJSONResponse({"detail": "nfcId is required."}, status=400)
     if not first_name:
-        return JsonResponse({"detail": "firstName is required."}, status=400)
+        return ORJSONResponse({"detail": "firstName is required."}, status=400)
     if not last_name:
-        return JsonResponse({"detail": "lastName is required."}, status=400)
+        return ORJSONResponse({"detail": "lastName is required."}, status=400)
 
-    if Patient.objects.filter(nfc_id=nfc_id).exists():
-        return JsonResponse(
-            {"detail": f"A patient is already linked to NFC tag '{nfc_id}'."},
-            status=409,
-        )
-
-    patient_id = nfc_id
+    fields = {field: coerce(body.get(field)) for field, coerce in _PATIENT_CREATE_FIELDS}
     p = Patient(
-        id=patient_id,
+        id=nfc_id,
         nfc_id=nfc_id,
         first_name=first_name,
         last_name=last_name,
-        date_of_birth=body.get("dateOfBirth") or body.get("date_of_birth") or "",
-        gender=body.get("gender") or "",
-        blood_type=body.get("bloodType") or body.get("blood_type") or "",
-        status=body.get("status") or "active",
-        room=body.get("room") or "",
-        admission_date=body.get("admissionDate") or body.get("admission_date") or "",
-        primary_diagnosis=body.get("primaryDiagnosis") or body.get("primary_diagnosis") or "",
-        insurance_provider=body.get("insuranceProvider") or body.get("insurance_provider") or "",
-        insurance_id=body.get("insuranceId") or body.get("insurance_id") or "",
-        use_alberta_health_card=body.get("useAlbertaHealthCard") or body.get("use_alberta_health_card") or False,
-        alberta_health_card_number=(body.get("albertaHealthCardNumber") or body.get("alberta_health_card_number") or "").strip()[:32],
-        allergies=_as_string_list(body.get("allergies")),
-        emergency_contact=body.get("emergencyContact") or body.get("emergency_contact") or {},
-        medications=body.get("medications") or [],
-        current_prescriptions=_as_string_list(
-            body.get("currentPrescriptions") if body.get("currentPrescriptions") is not None else body.get("current_prescriptions")
-        ),
-        medical_history=_as_string_list(
-            body.get("medicalHistory") if body.get("medicalHistory") is not None else body.get("medical_history")
-        ),
-        past_medical_history=_as_string_list(
-            body.get("pastMedicalHistory") if body.get("pastMedicalHistory") is not None else body.get("past_medical_history")
-        ),
-        important_test_results=(
-            body.get("importantTestResults")
-            if body.get("importantTestResults") is not None
-            else body.get("important_test_results")
-        ) or "",
-        notes=body.get("notes") or [],
-        historical_blood_pressure=body.get("historicalBloodPressure") or body.get("historical_blood_pressure") or [],
-        historical_heart_rate=body.get("historicalHeartRate") or body.get("historical_heart_rate") or [],
-        historical_body_weight=body.get("historicalBodyWeight") or body.get("historical_body_weight") or [],
-        family_history=body.get("familyHistory") or body.get("family_history") or [],
+        **fields,
     )
-    p.save()
-    return JsonResponse(p.to_api_dict(), status=201)
+    # Single INSERT; the unique id/nfc_id constraints report an existing tag.
+    try:
+        with transaction.atomic():
+            p.save(force_insert=True)
+    except IntegrityError:
+        return _detail_response(NFC_TAG_TAKEN, nfc_id, status=409)
+    return ORJSONResponse(p.to_api_dict(), status=201)
 
 
 @csrf_exempt
@@ -260,26 +493,21 @@ def nfc_scan(request):
     Body must include tag_id (the User ID read from the Arduino). Only returns
     patients that exist in the database for that nfc_id.
     """
-    try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Body must be valid JSON."}, status=400)
+    body, error = _parse_json_body(request, detail="Body must be valid JSON.")
+    if error is not None:
+        return error
 
     tag_id = (body.get("tag_id") or "").strip()
     if not tag_id:
-        return JsonResponse(
+        return ORJSONResponse(
             {"detail": "tag_id is required. Use the NFC reader to get the User ID."},
             status=400,
         )
 
-    try:
-        p = Patient.objects.get(nfc_id=tag_id)
-        return JsonResponse({"mode": "nfc-tag", "patient": p.to_api_dict()})
-    except Patient.DoesNotExist:
-        return JsonResponse(
-            {"detail": f"No patient mapped to NFC tag '{tag_id}'."},
-            status=404,
-        )
+    p = Patient.objects.filter(nfc_id=tag_id).first()
+    if p is None:
+        return _not_found(NFC_TAG_NOT_FOUND, tag_id)
+    return ORJSONResponse(b'{"mode":"nfc-tag","patient":' + _cached_api_bytes(p) + b"}")
 
 
 @csrf_exempt
@@ -289,39 +517,62 @@ def patient_ai_overview(request):
     POST /api/patients/ai-overview/
     Body: JSON with patient_id. Returns AI-generated overview (requires AI_OVERVIEW_API_KEY and AI_OVERVIEW_BASE_URL in .env).
     """
-    try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
 
     patient_id = (body.get("patient_id") or body.get("patientId") or "").strip()
     if not patient_id:
-        return JsonResponse({"detail": "patient_id is required."}, status=400)
+        return ORJSONResponse({"detail": "patient_id is required."}, status=400)
 
-    try:
-        patient = Patient.objects.get(pk=patient_id)
-    except Patient.DoesNotExist:
-        return JsonResponse({"detail": f"Patient '{patient_id}' not found."}, status=404)
+    patient = Patient.objects.only(*AI_OVERVIEW_COLUMNS).filter(pk=patient_id).first()
+    if patient is None:
+        return _not_found(PATIENT_NOT_FOUND, patient_id)
 
     prediction = None
     try:
-        from risk_scoring.service import RiskScoringService
-        prediction = RiskScoringService().predict(patient)
+        prediction = _risk().predict(patient)
     except Exception:
         pass
 
-    try:
-        overview = generate_ai_overview(patient, prediction)
-        return JsonResponse({"overview": overview or ""})
-    except AiOverviewError as e:
-        overview = build_fallback_overview(patient, prediction)
-        return JsonResponse(
-            {
-                "overview": overview,
-                "source": "fallback",
-                "warning": str(e),
-            }
-        )
+    model_version = prediction.model_version if prediction is not None else "none"
+    cache_key = f"ai_overview:{patient.pk}:{patient.updated_at.timestamp()}:{model_version}"
+    overview = cache.get(cache_key)
+    if overview is not None:
+        return ORJSONResponse({"overview": overview})
+
+    warning = cache.get(_AI_OVERVIEW_DOWN_KEY)
+    if warning is None:
+        try:
+            overview = generate_ai_overview(patient, prediction) or ""
+        except AiOverviewError as e:
+            warning = str(e)
+            cache.set(_AI_OVERVIEW_DOWN_KEY, warning, AI_OVERVIEW_RETRY_AFTER)
+        else:
+            cache.set(cache_key, overview, AI_OVERVIEW_CACHE_TIMEOUT)
+            return ORJSONResponse({"overview": overview})
+
+    overview = build_fallback_overview(patient, prediction)
+    return ORJSONResponse(
+        {
+            "overview": overview,
+            "source": "fallback",
+            "warning": warning,
+        }
+    )
+
+
+def _prediction_api_dict(prediction):
+    return {
+        "riskBand": prediction.risk_band,
+        "riskProbability": prediction.risk_probability,
+        "modelVersion": prediction.model_version,
+        "topFactors": prediction.top_factors or [],
+        "scoringMode": prediction.scoring_mode,
+        "seriousnessFactor": prediction.seriousness_factor,
+        "seriousnessLevel": prediction.seriousness_level,
+        "assessmentRecommendation": prediction.assessment_recommendation,
+    }
 
 
 @csrf_exempt
@@ -331,36 +582,61 @@ def patient_risk_score(request):
     POST /api/patients/risk-score/
     Body: JSON with patient_id. Returns risk band, probability, model version, top factors.
     """
-    try:
-        body = json.loads(request.body) if request.body else {}
-    except json.JSONDecodeError:
-        return JsonResponse({"detail": "Invalid JSON."}, status=400)
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
 
     patient_id = (body.get("patient_id") or body.get("patientId") or "").strip()
     if not patient_id:
-        return JsonResponse({"detail": "patient_id is required."}, status=400)
+        return ORJSONResponse({"detail": "patient_id is required."}, status=400)
+
+    patient = Patient.objects.only(*RISK_FEATURE_COLUMNS).filter(pk=patient_id).first()
+    if patient is None:
+        return _not_found(PATIENT_NOT_FOUND, patient_id)
 
     try:
-        patient = Patient.objects.get(pk=patient_id)
-    except Patient.DoesNotExist:
-        return JsonResponse({"detail": f"Patient '{patient_id}' not found."}, status=404)
+        prediction = _risk().predict(patient)
+    except Exception as e:
+        return ORJSONResponse(
+            {"detail": f"Risk scoring failed: {e}"},
+            status=503,
+        )
+
+    return ORJSONResponse(_prediction_api_dict(prediction))
 
+
+@csrf_exempt
+@require_POST
+def patient_risk_score_batch(request):
+    """
+    POST /api/patients/risk-score-batch/
+    Body: JSON with patient_ids (list, at most 500). Scores all patients with one
+    query and one model call; returns {patient_id: risk score} for the ids that exist.
+    """
+    body, error = _parse_json_body(request)
+    if error is not None:
+        return error
+
+    ids = body.get("patient_ids") or body.get("patientIds")
+    if not isinstance(ids, list) or not ids:
+        return ORJSONResponse({"detail": "patient_ids must be a non-empty list."}, status=400)
+    if len(ids) > RISK_BATCH_MAX_IDS:
+        return ORJSONResponse(
+            {"detail": f"patient_ids accepts at most {RISK_BATCH_MAX_IDS} ids."},
+            status=400,
+        )
+    ids = _as_string_list(ids)
+
+    patients = list(Patient.objects.filter(pk__in=ids).only(*RISK_FEATURE_COLUMNS))
     try:
-        from risk_scoring.service import RiskScoringService
-        prediction = RiskScoringService().predict(patient)
+        predictions = _risk().predict_many(patients)
     except Exception as e:
-        return JsonResponse(
+        return ORJSONResponse(
             {"detail": f"Risk scoring failed: {e}"},
             status=503,
         )
 
-    return JsonResponse({
-        "riskBand": prediction.risk_band,
-        "riskProbability": prediction.risk_probability,
-        "modelVersion": prediction.model_version,
-        "topFactors": prediction.top_factors or [],
-        "scoringMode": prediction.scoring_mode,
-        "seriousnessFactor": prediction.seriousness_factor,
-        "seriousnessLevel": prediction.seriousness_level,
-        "assessmentRecommendation": prediction.assessment_recommendation,
+    return ORJSONResponse({
+        p.id: _prediction_api_dict(prediction)
+        for p, prediction in zip(patients, predictions)
     })
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+import re
+from datetime import date
+from functools import lru_cache
+from operator import attrgetter
 from typing import Any, Dict, List
 
 # Compact feature schema shared by training and live scoring.
@@ -18,6 +21,9 @@ FEATURE_NUMERIC_COLUMNS = [
     "high_risk_prescription_count",
 ]
 FEATURE_CATEGORICAL_COLUMNS = ["gender"]
+# Fixed category set for the gender column. Values outside it become missing
+# and, like any unseen value, encode to all zeros (OneHotEncoder ignores them).
+KNOWN_GENDERS = ("female", "male", "other", "unknown")
 FEATURE_COLUMN_ORDER: List[str] = FEATURE_NUMERIC_COLUMNS + FEATURE_CATEGORICAL_COLUMNS
 
 SERIOUS_CONDITION_WEIGHTS: Dict[str, float] = {
@@ -75,23 +81,42 @@ HIGH_RISK_HISTORY_KEYWORDS = tuple(SERIOUS_CONDITION_WEIGHTS.keys()) + (
 )
 
 
+# "YYYY-MM-DDTHH:MM:SS" or "YYYY-MM-DD HH:MM:SS" with the exact field
+# patterns strptime uses for those formats (1-2 digit fields, case-insensitive
+# "T", any whitespace run as separator), so the time part is validated too.
+_DATETIME_RE = re.compile(
+    r"(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])"
+    r"(?:T|\s+)(?:2[0-3]|[0-1]\d|\d):(?:[0-5]\d|\d):(?:[0-5]\d|\d)\Z",
+    re.IGNORECASE,
+)
+
+
 # Parse ISO-like date/datetime strings into a date; return None on empty/invalid.
+# Datetime strings are matched with one precompiled pattern and the date part
+# is built directly, rather than trying strptime formats. Results are cached:
+# DOBs and admission dates repeat across scoring calls.
+@lru_cache(maxsize=4096)
+def _parse_date(raw: str) -> date | None:
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        pass
+    match = _DATETIME_RE.match(raw)
+    if match is None:
+        return None
+    try:
+        return date(int(match[1]), int(match[2]), int(match[3]))
+    except ValueError:
+        return None
+
+
 def _safe_date(value: str) -> date | None:
     if not value:
         return None
     raw = value.strip()
     if not raw:
         return None
-    try:
-        return date.fromisoformat(raw)
-    except ValueError:
-        pass
-    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(raw, fmt).date()
-        except ValueError:
-            continue
-    return None
+    return _parse_date(raw)
 
 
 # Normalize patient fields that may be scalar/list/dict into a clean list[str].
@@ -110,6 +135,22 @@ def _as_list(value: Any) -> list[str]:
     return [str(value).strip()] if str(value).strip() else []
 
 
+# Same count as len(_as_list(value)) without building the normalized strings.
+def _count_entries(value: Any) -> int:
+    if not value:
+        return 0
+    if isinstance(value, list):
+        count = 0
+        for item in value:
+            if isinstance(item, dict):
+                if any(str(v).strip() for v in item.values()):
+                    count += 1
+            elif str(item).strip():
+                count += 1
+        return count
+    return 1 if str(value).strip() else 0
+
+
 def _serious_condition_score(entries: list[str]) -> float:
     if not entries:
         return 0.0
@@ -132,13 +173,57 @@ def _keyword_hit_count(entries: list[str], keywords: tuple[str, ...]) -> int:
     return hits
 
 
+# Patient attributes read by patient_to_feature_dict, fetched with one C-level
+# attrgetter call; objects missing any of them fall back to per-name getattr.
+_PATIENT_SOURCE_FIELDS = (
+    "date_of_birth",
+    "admission_date",
+    "allergies",
+    "medications",
+    "current_prescriptions",
+    "medical_history",
+    "past_medical_history",
+    "primary_diagnosis",
+    "important_test_results",
+    "status",
+    "gender",
+)
+_get_patient_source_fields = attrgetter(*_PATIENT_SOURCE_FIELDS)
+
+
+def _patient_source_fields(patient: Any) -> tuple:
+    try:
+        return _get_patient_source_fields(patient)
+    except AttributeError:
+        return tuple(getattr(patient, name, None) for name in _PATIENT_SOURCE_FIELDS)
+
+
 # Build one model-ready feature row from a patient object.
 # Computes bounded age/length-of-stay features, count features, and normalized categories.
+# Batch callers pass now_date so "today" is read once per batch, not per patient.
 def patient_to_feature_dict(patient: Any, *, now_date: date | None = None) -> Dict[str, Any]:
     today = now_date or date.today()
+    # Patient model fields are decrypting properties; warm them all with one
+    # AES context so the attribute reads below are cache hits.
+    bulk_decrypt = getattr(patient, "bulk_decrypt", None)
+    if bulk_decrypt is not None:
+        bulk_decrypt()
+    (
+        dob_raw,
+        admission_raw,
+        allergies_raw,
+        medications_raw,
+        prescriptions_raw,
+        history_raw,
+        past_history_raw,
+        diagnosis_raw,
+        test_results_raw,
+        status_raw,
+        gender_raw,
+    ) = _patient_source_fields(patient)
 
-    dob = _safe_date(getattr(patient, "date_of_birth", "") or "")
-    admission = _safe_date(getattr(patient, "admission_date", "") or "")
+    dob = _safe_date(dob_raw or "")
+    admission = _safe_date(admission_raw or "")
     age_years_raw = (today - dob).days // 365 if dob else None
     days_since_admission_raw = (today - admission).days if admission else None
     age_years = age_years_raw
@@ -148,14 +233,14 @@ def patient_to_feature_dict(patient: Any, *, now_date: date | None = None) -> Di
     if days_since_admission is not None:
         days_since_admission = max(0, min(30, days_since_admission))
 
-    allergies = _as_list(getattr(patient, "allergies", []))
-    meds = _as_list(getattr(patient, "medications", []))
-    prescriptions = _as_list(getattr(patient, "current_prescriptions", []))
-    history = _as_list(getattr(patient, "medical_history", []))
-    past_history = _as_list(getattr(patient, "past_medical_history", []))
-    primary_diagnosis = str(getattr(patient, "primary_diagnosis", "") or "").strip()
-    important_test_results = str(getattr(patient, "important_test_results", "") or "").strip()
-    status = (getattr(patient, "status", "") or "unknown").strip().lower() or "unknown"
+    allergies = _as_list(allergies_raw)
+    med_count = _count_entries(medications_raw)
+    prescriptions = _as_list(prescriptions_raw)
+    history = _as_list(history_raw)
+    past_history = _as_list(past_history_raw)
+    primary_diagnosis = str(diagnosis_raw or "").strip()
+    important_test_results = str(test_results_raw or "").strip()
+    status = (status_raw or "unknown").strip().lower() or "unknown"
     combined_history = list(history) + list(past_history)
     if primary_diagnosis:
         combined_history.append(primary_diagnosis)
@@ -175,7 +260,7 @@ def patient_to_feature_dict(patient: Any, *, now_date: date | None = None) -> Di
     return {
         "age_years": float(age_years) if age_years is not None and age_years >= 0 else 0.0,
         "days_since_admission": float(days_since_admission) if days_since_admission is not None else 0.0,
-        "medication_count": float(len(meds) + len(prescriptions)),
+        "medication_count": float(med_count + len(prescriptions)),
         "current_prescription_count": float(len(prescriptions)),
         "allergy_count": float(len(allergies)),
         "high_risk_allergy_count": float(high_risk_allergy_count),
@@ -183,7 +268,7 @@ def patient_to_feature_dict(patient: Any, *, now_date: date | None = None) -> Di
         "high_risk_history_count": float(high_risk_history_count),
         "past_history_count": float(len(past_history)),
         "high_risk_prescription_count": float(high_risk_prescription_count),
-        "gender": (getattr(patient, "gender", "") or "unknown").strip().lower() or "unknown",
+        "gender": (gender_raw or "unknown").strip().lower() or "unknown",
         "age_years_raw": float(age_years_raw) if age_years_raw is not None and age_years_raw >= 0 else 0.0,
         "days_since_admission_raw": (
             float(max(0, days_since_admission_raw))
@@ -195,128 +280,71 @@ def patient_to_feature_dict(patient: Any, *, now_date: date | None = None) -> Di
         "status": status,
     }
 
-# Compute a bounded fallback probability using transparent additive rules.
-# Used when no trained model is available or model prediction fails.
-def heuristic_risk_score(feature_row: Dict[str, Any]) -> float:
-    """Same rule-based score used when no trained model is available (0–1)."""
+# Factor reported when no heuristic rule fires; score is the context-adjusted
+# probability, not the raw rule score.
+def baseline_risk_factor(score: float) -> Dict[str, Any]:
+    return {"feature": "baseline_risk", "direction": "up", "contribution": round(score, 4)}
+
+
+# Transparent additive rules behind the heuristic fallback score, used when no
+# trained model is available or model prediction fails. The score starts at
+# 0.08, adds each firing rule's contribution plus a serious-condition bonus and
+# is clamped to [0.01, 0.95]. In evaluation order:
+# (factor label, feature column, comparison, threshold, contribution).
+_HEURISTIC_RULES: tuple[tuple[str, str, str, Any, float], ...] = (
+    ("status=critical", "status", "==", "critical", 0.20),
+    ("days_since_admission>=14", "days_since_admission", ">=", 14, 0.10),
+    ("age>=75", "age_years", ">=", 75, 0.08),
+    ("medical_history_count>=4", "history_count", ">=", 4, 0.06),
+    ("past_medical_history_count>=2", "past_history_count", ">=", 2, 0.04),
+    ("medications_count=0", "medication_count", "==", 0, -0.04),
+    ("allergy_count>=2", "allergy_count", ">=", 2, 0.03),
+    ("high_risk_allergy_count>=1", "high_risk_allergy_count", ">=", 1, 0.06),
+    ("current_prescription_count>=3", "current_prescription_count", ">=", 3, 0.04),
+    ("high_risk_prescription_count>=1", "high_risk_prescription_count", ">=", 1, 0.06),
+    ("high_risk_history_count>=1", "high_risk_history_count", ">=", 1, 0.08),
+    ("days_since_admission_raw>=60", "days_since_admission_raw", ">=", 60, 0.05),
+    ("days_since_admission_raw>=180", "days_since_admission_raw", ">=", 180, 0.05),
+)
+
+
+def _heuristic_rule_masks(frame):
+    """Boolean matrix (rows x rules) of which heuristic rules fire for each row."""
+    import numpy as np
+
+    masks = np.zeros((len(frame), len(_HEURISTIC_RULES)), dtype=bool)
+    for j, (_label, column, op, threshold, _contribution) in enumerate(_HEURISTIC_RULES):
+        if column == "status":
+            values = frame[column].to_numpy(dtype=object)
+        else:
+            values = frame[column].fillna(0).to_numpy(dtype=float)
+        masks[:, j] = values == threshold if op == "==" else values >= threshold
+    return masks
+
+
+# Heuristic score plus up to 5 rule contributions explaining it, for one feature
+# row: each rule is evaluated once and feeds both the score and the factor list.
+# The list is empty when nothing fires; the caller then adds
+# baseline_risk_factor() for the context-adjusted score.
+def heuristic_score_and_factors(feature_row: Dict[str, Any]) -> tuple[float, list[Dict[str, Any]]]:
     score = 0.08
-    if feature_row.get("status") == "critical":
-        score += 0.20
-    if (feature_row.get("days_since_admission") or 0) >= 14:
-        score += 0.10
-    if (feature_row.get("age_years") or 0) >= 75:
-        score += 0.08
-    if (feature_row.get("history_count") or 0) >= 4:
-        score += 0.06
-    if (feature_row.get("past_history_count") or 0) >= 2:
-        score += 0.04
-    if (feature_row.get("medication_count") or 0) == 0:
-        score -= 0.04
-    if (feature_row.get("allergy_count") or 0) >= 2:
-        score += 0.03
-    if (feature_row.get("high_risk_allergy_count") or 0) >= 1:
-        score += 0.06
-    if (feature_row.get("current_prescription_count") or 0) >= 3:
-        score += 0.04
-    if (feature_row.get("high_risk_prescription_count") or 0) >= 1:
-        score += 0.06
-    if (feature_row.get("high_risk_history_count") or 0) >= 1:
-        score += 0.08
-    if (feature_row.get("days_since_admission_raw") or 0) >= 60:
-        score += 0.05
-    if (feature_row.get("days_since_admission_raw") or 0) >= 180:
-        score += 0.05
-    score += min(0.15, (feature_row.get("serious_condition_score") or 0.0) / 250.0)
-    return max(0.01, min(0.95, score))
-
-
-# Return up to 5 rule contributions explaining the heuristic score.
-# Keeps explainability payload shape similar to supervised scoring mode.
-def top_heuristic_factors(feature_row: Dict[str, Any], score: float) -> list[Dict[str, Any]]:
     factors: list[Dict[str, Any]] = []
-    if feature_row["status"] == "critical":
-        factors.append({"feature": "status=critical", "direction": "up", "contribution": 0.20})
-    if feature_row["days_since_admission"] >= 14:
-        factors.append({"feature": "days_since_admission>=14", "direction": "up", "contribution": 0.10})
-    if feature_row["age_years"] >= 75:
-        factors.append({"feature": "age>=75", "direction": "up", "contribution": 0.08})
-    if feature_row["history_count"] >= 4:
-        factors.append(
-            {
-                "feature": "medical_history_count>=4",
-                "direction": "up",
-                "contribution": 0.06,
-            }
-        )
-    if feature_row["past_history_count"] >= 2:
-        factors.append(
-            {
-                "feature": "past_medical_history_count>=2",
-                "direction": "up",
-                "contribution": 0.04,
-            }
-        )
-    if feature_row["medication_count"] == 0:
-        factors.append(
-            {
-                "feature": "medications_count=0",
-                "direction": "down",
-                "contribution": -0.04,
-            }
-        )
-    if feature_row.get("allergy_count", 0) >= 2:
-        factors.append(
-            {"feature": "allergy_count>=2", "direction": "up", "contribution": 0.03}
-        )
-    if feature_row.get("high_risk_allergy_count", 0) >= 1:
-        factors.append(
-            {
-                "feature": "high_risk_allergy_count>=1",
-                "direction": "up",
-                "contribution": 0.06,
-            }
-        )
-    if feature_row.get("current_prescription_count", 0) >= 3:
-        factors.append(
-            {
-                "feature": "current_prescription_count>=3",
-                "direction": "up",
-                "contribution": 0.04,
-            }
-        )
-    if feature_row.get("high_risk_prescription_count", 0) >= 1:
-        factors.append(
-            {
-                "feature": "high_risk_prescription_count>=1",
-                "direction": "up",
-                "contribution": 0.06,
-            }
-        )
-    if feature_row.get("high_risk_history_count", 0) >= 1:
-        factors.append(
-            {
-                "feature": "high_risk_history_count>=1",
-                "direction": "up",
-                "contribution": 0.08,
-            }
-        )
-    if feature_row.get("days_since_admission_raw", 0) >= 60:
-        factors.append(
-            {
-                "feature": "days_since_admission_raw>=60",
-                "direction": "up",
-                "contribution": 0.05,
-            }
-        )
-    if feature_row.get("days_since_admission_raw", 0) >= 180:
-        factors.append(
-            {
-                "feature": "days_since_admission_raw>=180",
-                "direction": "up",
-                "contribution": 0.05,
-            }
-        )
-    severe_bonus = min(0.12, (feature_row.get("serious_condition_score") or 0.0) / 300.0)
+    for label, column, op, threshold, contribution in _HEURISTIC_RULES:
+        value = feature_row.get(column) or 0
+        if value == threshold if op == "==" else value >= threshold:
+            score += contribution
+            factors.append(
+                {
+                    "feature": label,
+                    "direction": "up" if contribution >= 0 else "down",
+                    "contribution": contribution,
+                }
+            )
+    serious = feature_row.get("serious_condition_score") or 0.0
+    score += min(0.15, serious / 250.0)
+    score = max(0.01, min(0.95, score))
+
+    severe_bonus = min(0.12, serious / 300.0)
     if severe_bonus > 0:
         factors.append(
             {
@@ -325,27 +353,100 @@ def top_heuristic_factors(feature_row: Dict[str, Any], score: float) -> list[Dic
                 "contribution": round(severe_bonus, 4),
             }
         )
+    return score, factors[:5]
+
+
+# Vectorised heuristic score over a DataFrame of feature rows (one per
+# patient, as produced by patient_to_feature_dict). Returns a float array.
+def heuristic_risk_scores(frame, masks=None):
+    import numpy as np
+
+    if masks is None:
+        masks = _heuristic_rule_masks(frame)
+    score = np.full(len(frame), 0.08)
+    # Accumulate rule by rule so results match the scalar version exactly.
+    for j, rule in enumerate(_HEURISTIC_RULES):
+        score += np.where(masks[:, j], rule[4], 0.0)
+    serious = frame["serious_condition_score"].fillna(0.0).to_numpy(dtype=float)
+    score += np.minimum(0.15, serious / 250.0)
+    return np.clip(score, 0.01, 0.95)
 
-    if not factors:
-        factors.append({"feature": "baseline_risk", "direction": "up", "contribution": round(score, 4)})
-    return factors[:5]
+
+# Vectorised heuristic factor lists: rule masks are computed once for the whole
+# frame, then each row keeps its first five firing rules in table order.
+def top_heuristic_factors_many(frame, scores, masks=None) -> list[list[Dict[str, Any]]]:
+    import numpy as np
+
+    if masks is None:
+        masks = _heuristic_rule_masks(frame)
+    serious = frame["serious_condition_score"].fillna(0.0).to_numpy(dtype=float)
+    severe_bonus = np.minimum(0.12, serious / 300.0)
+    out: list[list[Dict[str, Any]]] = []
+    for i in range(len(frame)):
+        factors: list[Dict[str, Any]] = []
+        for j in np.flatnonzero(masks[i])[:5]:
+            label, _column, _op, _threshold, contribution = _HEURISTIC_RULES[j]
+            factors.append(
+                {
+                    "feature": label,
+                    "direction": "up" if contribution >= 0 else "down",
+                    "contribution": contribution,
+                }
+            )
+        if len(factors) < 5 and severe_bonus[i] > 0:
+            factors.append(
+                {
+                    "feature": "serious_conditions",
+                    "direction": "up",
+                    "contribution": round(float(severe_bonus[i]), 4),
+                }
+            )
+        if not factors:
+            factors.append(baseline_risk_factor(float(scores[i])))
+        out.append(factors)
+    return out
+
+
+def _numeric_or_zero(value: Any) -> float:
+    if value is None:
+        return 0.0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if number != number else number
+
+
+@lru_cache(maxsize=256)
+def _normalized_label(value: str) -> str:
+    return value.strip().lower() or "unknown"
+
+
+def _normalized_category(value: Any) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return "unknown"
+    return _normalized_label(value if isinstance(value, str) else str(value))
 
 
 # Convert feature dict rows into a DataFrame expected by the sklearn pipeline.
-# Enforces column order and normalizes numeric/categorical dtypes.
+# Enforces column order and normalizes numeric/categorical dtypes. Columns are
+# filled straight into typed numpy arrays (one pass over the rows) rather than
+# letting pandas infer dtypes from the dicts and coercing afterwards.
 def feature_dicts_to_dataframe(rows: List[Dict[str, Any]]):
     """Convert list of feature dicts to a DataFrame with columns in pipeline order."""
+    import numpy as np
     import pandas as pd
 
     if not rows:
         return pd.DataFrame(columns=FEATURE_COLUMN_ORDER)
-    df = pd.DataFrame(rows, columns=FEATURE_COLUMN_ORDER)
-    # Ensure numeric columns are numeric (fill missing with 0)
-    for col in FEATURE_NUMERIC_COLUMNS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(float)
-    # Ensure categorical columns are normalized strings
-    for col in FEATURE_CATEGORICAL_COLUMNS:
-        if col in df.columns:
-            df[col] = df[col].fillna("unknown").astype(str).str.strip().str.lower().replace("", "unknown")
-    return df
+    n_rows = len(rows)
+    numeric = np.zeros((len(FEATURE_NUMERIC_COLUMNS), n_rows), dtype=np.float64)
+    genders = np.empty(n_rows, dtype=object)
+    for i, row in enumerate(rows):
+        for j, col in enumerate(FEATURE_NUMERIC_COLUMNS):
+            numeric[j, i] = _numeric_or_zero(row.get(col))
+        genders[i] = _normalized_category(row.get("gender"))
+
+    columns: Dict[str, Any] = dict(zip(FEATURE_NUMERIC_COLUMNS, numeric))
+    columns["gender"] = pd.Categorical(genders, categories=KNOWN_GENDERS)
+    return pd.DataFrame(columns, columns=FEATURE_COLUMN_ORDER, copy=False)
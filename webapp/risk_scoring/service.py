@@ -1,24 +1,88 @@
 from __future__ import annotations
 
+import heapq
 import logging
+import os
 import re
+import threading
+import time
 from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from django.conf import settings
 
 from .features import (
+    baseline_risk_factor,
     feature_dicts_to_dataframe,
-    heuristic_risk_score,
+    heuristic_risk_scores,
+    heuristic_score_and_factors,
     patient_to_feature_dict,
-    top_heuristic_factors,
+    top_heuristic_factors_many,
 )
 
 logger = logging.getLogger(__name__)
 
+# Resolved once at import; without joblib only heuristic scoring is available.
+try:
+    import joblib
+except Exception as exc:
+    joblib = None
+    logger.warning("joblib unavailable, risk scoring will use the heuristic fallback: %s", exc)
+
+# Process-wide caches shared by all RiskScoringService instances:
+# artifact path -> (mtime_ns, loaded payload), and
+# (model_dir, configured version) -> (expires_at, dir mtime_ns, artifact listing).
+_PAYLOAD_CACHE: Dict[Path, tuple[int, Dict[str, Any]]] = {}
+_PAYLOAD_LOCK = threading.Lock()
+_LISTING_CACHE: Dict[tuple[Path, str], tuple[float, int | None, Any]] = {}
+_LISTING_TTL = 5.0
+_ARTIFACT_NAME_RE = re.compile(r"risk_model_risk-v(\d+)-(\d+)\.joblib\Z")
+
+# Seriousness-score adjustment per normalised patient status.
+_STATUS_SERIOUSNESS_ADJUSTMENT = {"critical": 12.0, "discharged": -12.0}
+_BAND_LABELS = ("low", "medium", "high")
+# (medium, high) cut-offs used when no payload thresholds apply; this is what
+# _normalized_band_thresholds(None) returns.
+_DEFAULT_BANDS = (0.15, 0.35)
+
+# Additive context rules applied after the status effects, in this order:
+# (raw admission days >= threshold, delta, label), then the severe-condition
+# bonus, then (feature key, count >= threshold, delta, label).
+_CONTEXT_DAY_RULES = (
+    (60, 0.03, "days_since_admission_raw>=60"),
+    (180, 0.05, "days_since_admission_raw>=180"),
+)
+_CONTEXT_COUNT_RULES = (
+    ("high_risk_history_count", 1, 0.07, "high_risk_history_count>=1"),
+    ("high_risk_prescription_count", 1, 0.05, "high_risk_prescription_count>=1"),
+    ("high_risk_allergy_count", 1, 0.04, "high_risk_allergy_count>=1"),
+    ("current_prescription_count", 3, 0.03, "current_prescription_count>=3"),
+)
+
+# Feature-row fields read by _seriousness_assessment, fetched in one C-level
+# call. Rows come from patient_to_feature_dict, which fills every key (the
+# counts and scores as floats).
+_seriousness_inputs = itemgetter(
+    "high_risk_allergy_count",
+    "high_risk_history_count",
+    "high_risk_prescription_count",
+    "serious_condition_score",
+    "allergy_count",
+    "history_count",
+    "past_history_count",
+    "current_prescription_count",
+    "medication_count",
+    "age_years_raw",
+    "days_since_admission_raw",
+    "status",
+)
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RiskPrediction:
     risk_probability: float
     risk_band: str
@@ -36,33 +100,34 @@ class RiskScoringService:
         self.model_dir = Path(settings.BASE_DIR) / "risk_scoring" / "artifacts"
         self._last_load_error: str | None = None
 
-    # Map probability to low/medium/high with payload thresholds when available.
-    # Applies safe defaults and guards against invalid threshold ordering.
+    # Band lookup against already-normalized (medium, high) cut-offs.
     @staticmethod
-    def _to_band(prob: float, thresholds: Dict[str, Any] | None = None) -> str:
-        medium = 0.15
-        high = 0.35
-        if isinstance(thresholds, dict):
-            try:
-                medium = float(thresholds.get("medium", medium))
-            except (TypeError, ValueError):
-                medium = 0.15
-            try:
-                high = float(thresholds.get("high", high))
-            except (TypeError, ValueError):
-                high = 0.35
-        if high <= medium:
-            high = medium + 0.05
-
+    def _band_for(prob: float, medium: float, high: float) -> str:
         if prob >= high:
             return "high"
         if prob >= medium:
             return "medium"
         return "low"
 
-    # Wrapper for deterministic fallback scoring to keep predict() flow simple.
-    def _heuristic_score(self, feature_row: Dict[str, Any]) -> float:
-        return heuristic_risk_score(feature_row)
+    # Vectorised _band_for: one searchsorted over the sorted cut-offs maps each
+    # probability to 0/1/2 (low/medium/high); the same >= semantics as above.
+    @staticmethod
+    def _bands_for(probs, medium: float, high: float) -> List[str]:
+        import numpy as np
+
+        codes = np.searchsorted(np.array([medium, high]), probs, side="right")
+        return [_BAND_LABELS[code] for code in codes.tolist()]
+
+    # Normalized (medium, high) for a payload, parsed once and kept on it.
+    @staticmethod
+    def _payload_bands(model_payload: Dict[str, Any]) -> tuple[float, float]:
+        bands = model_payload.get("_bands")
+        if bands is None:
+            bands = RiskScoringService._normalized_band_thresholds(
+                model_payload.get("band_thresholds")
+            )
+            model_payload["_bands"] = bands
+        return bands
 
     @staticmethod
     def _normalized_band_thresholds(
@@ -90,11 +155,13 @@ class RiskScoringService:
         probability: float,
         feature_row: Dict[str, Any],
         thresholds: Dict[str, Any] | None = None,
+        bands: tuple[float, float] | None = None,
     ) -> tuple[float, List[Dict[str, Any]]]:
         adjusted = float(max(0.0, min(1.0, probability)))
         factors: List[Dict[str, Any]] = []
 
-        status = str(feature_row.get("status", "") or "").strip().lower()
+        # patient_to_feature_dict already stores status stripped and lowercased.
+        status = feature_row.get("status")
         if status == "critical" and adjusted < 0.45:
             delta = 0.45 - adjusted
             adjusted = 0.45
@@ -116,29 +183,14 @@ class RiskScoringService:
                 }
             )
 
-        raw_days = float(
-            feature_row.get("days_since_admission_raw")
-            or feature_row.get("days_since_admission")
-            or 0.0
-        )
-        if raw_days >= 60:
-            adjusted += 0.03
-            factors.append(
-                {
-                    "feature": "days_since_admission_raw>=60",
-                    "direction": "up",
-                    "contribution": 0.03,
-                }
-            )
-        if raw_days >= 180:
-            adjusted += 0.05
-            factors.append(
-                {
-                    "feature": "days_since_admission_raw>=180",
-                    "direction": "up",
-                    "contribution": 0.05,
-                }
-            )
+        # patient_to_feature_dict always fills the *_raw keys (0.0 when unknown),
+        # and the clipped columns are 0 whenever the raw value is, so the raw
+        # keys are read directly without falling back to the clipped ones.
+        raw_days = feature_row["days_since_admission_raw"]
+        for threshold, delta, label in _CONTEXT_DAY_RULES:
+            if raw_days >= threshold:
+                adjusted += delta
+                factors.append({"feature": label, "direction": "up", "contribution": delta})
 
         severe_score = float(feature_row.get("serious_condition_score") or 0.0)
         severe_bonus = min(0.12, severe_score / 300.0)
@@ -152,49 +204,17 @@ class RiskScoringService:
                 }
             )
 
-        if (feature_row.get("high_risk_history_count") or 0) >= 1:
-            adjusted += 0.07
-            factors.append(
-                {
-                    "feature": "high_risk_history_count>=1",
-                    "direction": "up",
-                    "contribution": 0.07,
-                }
-            )
-        if (feature_row.get("high_risk_prescription_count") or 0) >= 1:
-            adjusted += 0.05
-            factors.append(
-                {
-                    "feature": "high_risk_prescription_count>=1",
-                    "direction": "up",
-                    "contribution": 0.05,
-                }
-            )
-        if (feature_row.get("high_risk_allergy_count") or 0) >= 1:
-            adjusted += 0.04
-            factors.append(
-                {
-                    "feature": "high_risk_allergy_count>=1",
-                    "direction": "up",
-                    "contribution": 0.04,
-                }
-            )
-        if (feature_row.get("current_prescription_count") or 0) >= 3:
-            adjusted += 0.03
-            factors.append(
-                {
-                    "feature": "current_prescription_count>=3",
-                    "direction": "up",
-                    "contribution": 0.03,
-                }
-            )
+        for key, threshold, delta, label in _CONTEXT_COUNT_RULES:
+            if (feature_row.get(key) or 0) >= threshold:
+                adjusted += delta
+                factors.append({"feature": label, "direction": "up", "contribution": delta})
 
         # Policy override: very advanced age should not remain in low/medium due
         # solely to model calibration artifacts.
-        age_raw = float(
-            feature_row.get("age_years_raw") or feature_row.get("age_years") or 0.0
-        )
-        _medium, high = RiskScoringService._normalized_band_thresholds(thresholds)
+        age_raw = feature_row["age_years_raw"]
+        if bands is None:
+            bands = RiskScoringService._normalized_band_thresholds(thresholds)
+        high = bands[1]
         if age_raw >= 110:
             floor = min(0.95, high + 0.02)
             if adjusted < floor:
@@ -223,6 +243,81 @@ class RiskScoringService:
         adjusted = float(max(0.01, min(0.95, adjusted)))
         return adjusted, factors
 
+    # Batch form of _context_adjust_probability: the same ladder applied with
+    # numpy masks over all rows. Steps run in the scalar order so every
+    # probability and rounded contribution matches it exactly; factors are
+    # appended rule by rule, which keeps each row's list in scalar order too.
+    @staticmethod
+    def _context_adjust_probabilities(
+        probabilities,
+        feature_rows: List[Dict[str, Any]],
+        bands: tuple[float, float],
+    ) -> tuple[Any, List[List[Dict[str, Any]]]]:
+        import numpy as np
+
+        n_rows = len(feature_rows)
+        statuses = np.array([row.get("status") for row in feature_rows], dtype=object)
+        count_keys = [rule[0] for rule in _CONTEXT_COUNT_RULES]
+        columns = np.array(
+            [
+                (
+                    row["days_since_admission_raw"],
+                    float(row.get("serious_condition_score") or 0.0),
+                    row["age_years_raw"],
+                    *[float(row.get(key) or 0) for key in count_keys],
+                )
+                for row in feature_rows
+            ],
+            dtype=float,
+        ).reshape(n_rows, 3 + len(count_keys))
+        raw_days, severe_score, age_raw = columns[:, 0], columns[:, 1], columns[:, 2]
+
+        all_factors: List[List[Dict[str, Any]]] = [[] for _ in range(n_rows)]
+
+        def add(mask, feature: str, direction: str, contributions) -> None:
+            for i in np.flatnonzero(mask):
+                contribution = contributions if isinstance(contributions, float) else round(
+                    float(contributions[i]), 4
+                )
+                all_factors[i].append(
+                    {"feature": feature, "direction": direction, "contribution": contribution}
+                )
+
+        adjusted = np.clip(np.asarray(probabilities, dtype=float), 0.0, 1.0)
+
+        critical = (statuses == "critical") & (adjusted < 0.45)
+        add(critical, "status=critical", "up", 0.45 - adjusted)
+        adjusted = np.where(critical, 0.45, adjusted)
+        discharged = statuses == "discharged"
+        discharge_delta = -np.minimum(0.10, adjusted * 0.40)
+        add(discharged, "status=discharged", "down", discharge_delta)
+        adjusted = np.where(discharged, adjusted + discharge_delta, adjusted)
+
+        for threshold, delta, label in _CONTEXT_DAY_RULES:
+            mask = raw_days >= threshold
+            adjusted += np.where(mask, delta, 0.0)
+            add(mask, label, "up", delta)
+
+        severe_bonus = np.minimum(0.12, severe_score / 300.0)
+        has_bonus = severe_bonus > 0
+        adjusted += np.where(has_bonus, severe_bonus, 0.0)
+        add(has_bonus, "serious_conditions", "up", severe_bonus)
+
+        for column, (_key, threshold, delta, label) in enumerate(_CONTEXT_COUNT_RULES, start=3):
+            mask = columns[:, column] >= threshold
+            adjusted += np.where(mask, delta, 0.0)
+            add(mask, label, "up", delta)
+
+        high = bands[1]
+        very_old = age_raw >= 110
+        floor = np.where(very_old, min(0.95, high + 0.02), high)
+        lifted = (age_raw >= 100) & (adjusted < floor)
+        add(lifted & very_old, "age_years_raw>=110", "up", floor - adjusted)
+        add(lifted & ~very_old, "age_years_raw>=100", "up", floor - adjusted)
+        adjusted = np.where(lifted, floor, adjusted)
+
+        return np.clip(adjusted, 0.01, 0.95), all_factors
+
     @staticmethod
     def _merge_top_factors(
         base_factors: List[Dict[str, Any]],
@@ -230,13 +325,14 @@ class RiskScoringService:
         *,
         limit: int = 5,
     ) -> List[Dict[str, Any]]:
-        merged = [*extra_factors, *base_factors]
+        # nlargest keys each factor once and matches a stable reverse sort.
         merged = [
-            f for f in merged if abs(float(f.get("contribution", 0.0))) >= 1e-9
+            (magnitude, f)
+            for f in (*extra_factors, *base_factors)
+            if (magnitude := abs(float(f.get("contribution", 0.0)))) >= 1e-9
         ]
-        merged.sort(key=lambda f: abs(float(f.get("contribution", 0.0))), reverse=True)
         if merged:
-            return merged[:limit]
+            return [f for _magnitude, f in heapq.nlargest(limit, merged, key=itemgetter(0))]
         return (base_factors or extra_factors)[:limit]
 
     @staticmethod
@@ -265,61 +361,60 @@ class RiskScoringService:
         # Scale base to 0–55 so overall scores sit in a lower range
         base = float(probability) * 55.0
 
+        (
+            high_risk_allergy_count,
+            high_risk_history_count,
+            high_risk_prescription_count,
+            serious_score,
+            allergy_count,
+            history_count,
+            past_count,
+            prescription_count,
+            medication_count,
+            age_raw,
+            raw_days,
+            status,
+        ) = _seriousness_inputs(feature_row)
+
         # Clinical floor: high-risk patients must not get a trivial score
-        high_risk_allergy = float(feature_row.get("high_risk_allergy_count") or 0.0) >= 1
-        high_risk_history = float(feature_row.get("high_risk_history_count") or 0.0) >= 1
-        serious_score = float(feature_row.get("serious_condition_score") or 0.0)
-        allergy_count = float(feature_row.get("allergy_count") or 0.0)
-        history_count = float(feature_row.get("history_count") or 0.0)
-        past_count = float(feature_row.get("past_history_count") or 0.0)
+        high_risk_allergy = high_risk_allergy_count >= 1
+        high_risk_history = high_risk_history_count >= 1
+        high_risk_prescription = high_risk_prescription_count >= 1
         clinical_floor = 1.0
-        if serious_score >= 15 or (high_risk_history and float(feature_row.get("high_risk_prescription_count") or 0.0) >= 1):
+        if serious_score >= 15 or (high_risk_history and high_risk_prescription):
             clinical_floor = 38.0
-        elif serious_score >= 8 or high_risk_history or (high_risk_allergy and float(feature_row.get("high_risk_prescription_count") or 0.0) >= 1):
+        elif serious_score >= 8 or high_risk_history or (high_risk_allergy and high_risk_prescription):
             clinical_floor = 28.0
-        elif high_risk_allergy or float(feature_row.get("high_risk_prescription_count") or 0.0) >= 1 or allergy_count >= 2 or (history_count >= 4 or past_count >= 2):
+        elif high_risk_allergy or high_risk_prescription or allergy_count >= 2 or (history_count >= 4 or past_count >= 2):
             clinical_floor = 18.0
         base = max(base, clinical_floor)
 
         # Context adjustment (capped so scores don’t cluster at the top)
-        adjustment = 0.0
-        status = str(feature_row.get("status", "") or "").strip().lower()
-        if status == "critical":
-            adjustment += 12.0
-        elif status == "discharged":
-            adjustment -= 12.0
+        adjustment = _STATUS_SERIOUSNESS_ADJUSTMENT.get(status, 0.0)
 
-        age_for_context = float(
-            feature_row.get("age_years_raw") or feature_row.get("age_years") or 0.0
-        )
-        if age_for_context >= 75:
+        if age_raw >= 75:
             adjustment += 3.0
-        raw_days = float(
-            feature_row.get("days_since_admission_raw")
-            or feature_row.get("days_since_admission")
-            or 0.0
-        )
         if raw_days >= 14:
             adjustment += 2.0
         if raw_days >= 60:
             adjustment += 2.0
         if raw_days >= 180:
             adjustment += 3.0
-        if (feature_row.get("history_count") or 0) >= 4:
+        if history_count >= 4:
             adjustment += 2.0
-        if (feature_row.get("past_history_count") or 0) >= 2:
+        if past_count >= 2:
             adjustment += 2.0
-        if (feature_row.get("allergy_count") or 0) >= 2:
+        if allergy_count >= 2:
             adjustment += 1.0
-        adjustment += min(3.0, float(feature_row.get("high_risk_allergy_count") or 0.0) * 2.0)
-        if (feature_row.get("current_prescription_count") or 0) >= 3:
+        adjustment += min(3.0, high_risk_allergy_count * 2.0)
+        if prescription_count >= 3:
             adjustment += 2.0
-        adjustment += min(4.0, float(feature_row.get("high_risk_prescription_count") or 0.0) * 2.0)
-        if (feature_row.get("high_risk_history_count") or 0) >= 1:
+        adjustment += min(4.0, high_risk_prescription_count * 2.0)
+        if high_risk_history:
             adjustment += 4.0
-        if (feature_row.get("medication_count") or 0) == 0:
+        if medication_count == 0:
             adjustment += 1.0
-        adjustment += min(8.0, float(feature_row.get("serious_condition_score") or 0.0) * 0.4)
+        adjustment += min(8.0, serious_score * 0.4)
 
         adjustment = max(-12.0, min(18.0, adjustment))
         score = base + adjustment
@@ -348,222 +443,386 @@ class RiskScoringService:
 
         return round(score, 1), level, recommendation
 
-    # Main runtime entrypoint: build features, run supervised model, fallback if needed.
-    # Returns API-ready prediction payload fields via RiskPrediction.
-    def predict(self, patient: Any) -> RiskPrediction:
-        feature_row = patient_to_feature_dict(patient)
-        model_payload = self._load_latest_model_payload()
-        if not model_payload:
-            score = self._heuristic_score(feature_row)
-            score, context_factors = self._context_adjust_probability(
-                score,
-                feature_row,
-                thresholds=None,
-            )
-            pre_band = self._to_band(score)
-            seriousness_factor, seriousness_level, assessment_recommendation = (
-                self._seriousness_assessment(score, pre_band, feature_row)
-            )
-            risk_probability, risk_band = self._risk_from_seriousness(
-                seriousness_factor, seriousness_level
-            )
-            factors = self._merge_top_factors(
-                top_heuristic_factors(feature_row, score),
-                context_factors,
-            )
-            return RiskPrediction(
-                risk_probability=risk_probability,
-                risk_band=risk_band,
-                model_version="heuristic-v1",
-                top_factors=factors,
-                scoring_mode="heuristic",
-                seriousness_factor=seriousness_factor,
-                seriousness_level=seriousness_level,
-                assessment_recommendation=assessment_recommendation,
-            )
-
-        pipeline = model_payload.get("pipeline")
-        calibrator = model_payload.get("calibrator")
-        thresholds = model_payload.get("band_thresholds")
-        X = feature_dicts_to_dataframe([feature_row])
+    # Deterministic fallback used when no model artifact loads or the model fails.
+    def _heuristic_prediction(self, feature_row: Dict[str, Any]) -> RiskPrediction:
+        score, base_factors = heuristic_score_and_factors(feature_row)
+        score, context_factors = self._context_adjust_probability(
+            score,
+            feature_row,
+            bands=_DEFAULT_BANDS,
+        )
+        if not base_factors:
+            base_factors = [baseline_risk_factor(score)]
+        return self._assemble_prediction(
+            score,
+            self._band_for(score, *_DEFAULT_BANDS),
+            feature_row,
+            base_factors,
+            context_factors,
+            model_version="heuristic-v1",
+            scoring_mode="heuristic",
+        )
 
-        try:
-            if calibrator is not None:
-                prob = calibrator.predict_proba(X)[:, 1][0]
-            else:
-                prob = pipeline.predict_proba(X)[:, 1][0]
-            prob = float(max(0.0, min(1.0, prob)))
-            factors = self._top_model_factors(model_payload, X)
-        except Exception as exc:
-            logger.warning("Risk model prediction failed, using heuristic fallback: %s", exc)
-            score = self._heuristic_score(feature_row)
-            score, context_factors = self._context_adjust_probability(
+    # Heuristic fallback for a batch: rule scores, factors, the context
+    # adjustment and the pre-band are all evaluated column-wise over the rows;
+    # only the seriousness assessment runs per row.
+    def _heuristic_predictions(self, feature_rows: List[Dict[str, Any]]) -> List[RiskPrediction]:
+        if len(feature_rows) == 1:
+            return [self._heuristic_prediction(feature_rows[0])]
+        import pandas as pd
+
+        frame = pd.DataFrame.from_records(feature_rows)
+        adjusted, context_lists = self._context_adjust_probabilities(
+            heuristic_risk_scores(frame), feature_rows, _DEFAULT_BANDS
+        )
+        # baseline_risk reports the context-adjusted score, not the raw rule score.
+        base_factors = top_heuristic_factors_many(frame, adjusted)
+        pre_bands = self._bands_for(adjusted, *_DEFAULT_BANDS)
+        return [
+            self._assemble_prediction(
                 score,
+                pre_band,
                 feature_row,
-                thresholds=None,
-            )
-            pre_band = self._to_band(score)
-            seriousness_factor, seriousness_level, assessment_recommendation = (
-                self._seriousness_assessment(score, pre_band, feature_row)
-            )
-            risk_probability, risk_band = self._risk_from_seriousness(
-                seriousness_factor, seriousness_level
-            )
-            factors = self._merge_top_factors(
-                top_heuristic_factors(feature_row, score),
+                factors,
                 context_factors,
-            )
-            return RiskPrediction(
-                risk_probability=risk_probability,
-                risk_band=risk_band,
                 model_version="heuristic-v1",
-                top_factors=factors,
                 scoring_mode="heuristic",
-                seriousness_factor=seriousness_factor,
-                seriousness_level=seriousness_level,
-                assessment_recommendation=assessment_recommendation,
             )
+            for feature_row, score, pre_band, factors, context_factors in zip(
+                feature_rows, adjusted.tolist(), pre_bands, base_factors, context_lists
+            )
+        ]
 
-        prob, context_factors = self._context_adjust_probability(
-            prob,
-            feature_row,
-            thresholds=thresholds,
-        )
-        factors = self._merge_top_factors(factors, context_factors)
-        pre_band = self._to_band(prob, thresholds)
+    # Shared tail of every scoring path: merge model/rule factors with the
+    # context factors, then derive seriousness and the published band from
+    # the adjusted probability and its pre-band.
+    def _assemble_prediction(
+        self,
+        probability: float,
+        pre_band: str,
+        feature_row: Dict[str, Any],
+        base_factors: List[Dict[str, Any]],
+        context_factors: List[Dict[str, Any]],
+        *,
+        model_version: str,
+        scoring_mode: str,
+    ) -> RiskPrediction:
         seriousness_factor, seriousness_level, assessment_recommendation = (
-            self._seriousness_assessment(prob, pre_band, feature_row)
+            self._seriousness_assessment(probability, pre_band, feature_row)
         )
         risk_probability, risk_band = self._risk_from_seriousness(
             seriousness_factor, seriousness_level
         )
-
         return RiskPrediction(
             risk_probability=risk_probability,
             risk_band=risk_band,
-            model_version=model_payload.get("model_version", "model-unknown"),
-            top_factors=factors,
-            scoring_mode="supervised",
+            model_version=model_version,
+            top_factors=self._merge_top_factors(base_factors, context_factors),
+            scoring_mode=scoring_mode,
             seriousness_factor=seriousness_factor,
             seriousness_level=seriousness_level,
             assessment_recommendation=assessment_recommendation,
         )
 
-    # Convert transformed feature names (e.g. num__/cat__) to human-friendly labels.
-    @staticmethod
-    def _humanize_feature_name(name: str) -> str:
-        aliases = {
-            "age_years": "age_years",
-            "days_since_admission": "days_since_admission",
-            "medication_count": "medications_count",
-            "current_prescription_count": "current_prescription_count",
-            "allergy_count": "allergy_count",
-            "high_risk_allergy_count": "high_risk_allergy_count",
-            "history_count": "medical_history_count",
-            "high_risk_history_count": "high_risk_history_count",
-            "past_history_count": "past_medical_history_count",
-            "high_risk_prescription_count": "high_risk_prescription_count",
-        }
-        if name.startswith("num__"):
-            raw = name.replace("num__", "", 1)
-            return aliases.get(raw, raw)
-        if name.startswith("cat__"):
-            raw = name.replace("cat__", "", 1)
-            if "_" in raw:
-                field, value = raw.split("_", 1)
-                return f"{aliases.get(field, field)}={value}"
-            return aliases.get(raw, raw)
-        return aliases.get(name, name)
-
-    # Compute per-patient top contributions as transformed_value * coefficient.
-    # Falls back to stored top weights for older artifact formats.
-    def _top_model_factors(self, model_payload: Dict[str, Any], X):
-        factors: List[Dict[str, Any]] = []
+    # Main runtime entrypoint: build features, run supervised model, fallback if needed.
+    # Returns API-ready prediction payload fields via RiskPrediction.
+    def predict(self, patient: Any) -> RiskPrediction:
+        return self.predict_many([patient])[0]
+
+    # Batch variant of predict(): loads the model payload once and scores every
+    # patient with a single predict_proba call. Results keep the input order.
+    def predict_many(self, patients: List[Any]) -> List[RiskPrediction]:
+        today = date.today()
+        feature_rows = [patient_to_feature_dict(patient, now_date=today) for patient in patients]
+        if not feature_rows:
+            return []
+        model_payload = self._load_latest_model_payload()
+        if not model_payload:
+            return self._heuristic_predictions(feature_rows)
+
+        pipeline = model_payload.get("pipeline")
+        calibrator = model_payload.get("calibrator")
+        bands = self._payload_bands(model_payload)
+        model_version = model_payload.get("model_version", "model-unknown")
+        X = feature_dicts_to_dataframe(feature_rows)
+
+        # Without a calibrator the preprocess output is shared between the
+        # probability and the factor explanation, so X is transformed once.
+        transformed = None
         try:
+            if calibrator is not None:
+                probs = calibrator.predict_proba(X)[:, 1]
+            else:
+                transformed = pipeline.named_steps["preprocess"].transform(X)
+                probs = pipeline.named_steps["model"].predict_proba(transformed)[:, 1]
+        except Exception as exc:
+            logger.warning("Risk model prediction failed, using heuristic fallback: %s", exc)
+            return self._heuristic_predictions(feature_rows)
+
+        model_factors = self._top_model_factors_many(model_payload, X, transformed)
+        if len(feature_rows) == 1:
+            prob, context_factors = self._context_adjust_probability(
+                float(max(0.0, min(1.0, probs[0]))),
+                feature_rows[0],
+                bands=bands,
+            )
+            adjusted = [(prob, context_factors, self._band_for(prob, *bands))]
+        else:
+            adjusted_probs, context_lists = self._context_adjust_probabilities(
+                probs, feature_rows, bands
+            )
+            pre_bands = self._bands_for(adjusted_probs, *bands)
+            adjusted = zip(adjusted_probs.tolist(), context_lists, pre_bands)
+        return [
+            self._assemble_prediction(
+                prob,
+                pre_band,
+                feature_row,
+                factors,
+                context_factors,
+                model_version=model_version,
+                scoring_mode="supervised",
+            )
+            for feature_row, factors, (prob, context_factors, pre_band) in zip(
+                feature_rows, model_factors, adjusted
+            )
+        ]
+
+    # Humanized feature labels and coefficient vectors for a loaded payload.
+    # Computed once per payload and stored on it; payloads are cached per file.
+    # The float32 copy is only used to rank columns; reported contributions
+    # are recomputed from the float64 coefficients.
+    def _model_explainer(self, model_payload: Dict[str, Any]) -> tuple[List[str], Any, Any]:
+        explainer = model_payload.get("_explainer")
+        if explainer is None:
             import numpy as np
 
             pipeline = model_payload["pipeline"]
-            preprocess = pipeline.named_steps["preprocess"]
-            model = pipeline.named_steps["model"]
-            names = preprocess.get_feature_names_out()
-            transformed = preprocess.transform(X)
-            row = transformed.toarray()[0] if hasattr(transformed, "toarray") else np.asarray(transformed)[0]
-            coefs = model.coef_[0]
-            contributions = np.asarray(row) * np.asarray(coefs)
-
-            order = np.argsort(np.abs(contributions))[::-1]
-            for idx in order:
-                contribution = float(contributions[idx])
-                if abs(contribution) < 1e-9:
-                    continue
-                factors.append(
-                    {
-                        "feature": self._humanize_feature_name(str(names[idx])),
-                        "direction": "up" if contribution >= 0 else "down",
-                        "contribution": round(contribution, 4),
-                    }
-                )
-                if len(factors) >= 5:
-                    break
+            names = pipeline.named_steps["preprocess"].get_feature_names_out()
+            labels = [_humanize_feature_name(str(name)) for name in names]
+            coefs = np.ascontiguousarray(pipeline.named_steps["model"].coef_[0], dtype=np.float64)
+            explainer = (labels, coefs, coefs.astype(np.float32))
+            model_payload["_explainer"] = explainer
+        return explainer
+
+    # Yield (column indices, raw values, float32 ranking contributions) per
+    # row of the transformed matrix. Sparse output is multiplied on its stored
+    # entries only (zeros cannot rank); dense output is multiplied row-wise
+    # against the full coef vector.
+    @staticmethod
+    def _row_contributions(transformed, coefs32):
+        import numpy as np
+        from scipy import sparse
+
+        if sparse.issparse(transformed):
+            csr = sparse.csr_matrix(transformed)
+            data32 = csr.data.astype(np.float32, copy=False)
+            for row_idx in range(csr.shape[0]):
+                start, end = csr.indptr[row_idx], csr.indptr[row_idx + 1]
+                cols = csr.indices[start:end]
+                yield cols, csr.data[start:end], data32[start:end] * coefs32[cols]
+            return
+        matrix = np.asarray(transformed)
+        ranking = matrix.astype(np.float32, copy=False) * coefs32[None, :]
+        all_cols = np.arange(matrix.shape[1])
+        for row, ranked in zip(matrix, ranking):
+            yield all_cols, row, ranked
+
+    # Up to k (column, contribution) pairs with the largest |contribution|,
+    # largest first; argpartition keeps this O(n) in the row width. Only the
+    # winners are multiplied out in float64 for reporting.
+    @staticmethod
+    def _top_contributions(cols, raw_values, ranking, coefs, k: int) -> List[tuple[int, float]]:
+        import numpy as np
+
+        k = min(k, len(ranking))
+        if k == 0:
+            return []
+        magnitudes = np.abs(ranking)
+        top = np.argpartition(-magnitudes, k - 1)[:k]
+        top = top[np.argsort(-magnitudes[top], kind="stable")]
+        return [(int(cols[i]), float(raw_values[i]) * float(coefs[cols[i]])) for i in top]
+
+    # Per-patient top contributions as transformed_value * coefficient: one
+    # transform for all rows (or the caller's precomputed one), then the top-5
+    # |contribution| columns per row via argpartition on the 2-D matrix.
+    # Falls back to stored top weights for older artifact formats.
+    def _top_model_factors_many(
+        self, model_payload: Dict[str, Any], X, transformed=None
+    ) -> List[List[Dict[str, Any]]]:
+        n_rows = len(X)
+        try:
+            labels, coefs, coefs32 = self._model_explainer(model_payload)
+            if transformed is None:
+                transformed = model_payload["pipeline"].named_steps["preprocess"].transform(X)
+            all_factors: List[List[Dict[str, Any]]] = []
+            for cols, raw_values, ranking in self._row_contributions(transformed, coefs32):
+                factors: List[Dict[str, Any]] = []
+                for idx, contribution in self._top_contributions(cols, raw_values, ranking, coefs, 5):
+                    if abs(contribution) < 1e-9:
+                        continue
+                    factors.append(
+                        {
+                            "feature": labels[idx],
+                            "direction": "up" if contribution >= 0 else "down",
+                            "contribution": round(contribution, 4),
+                        }
+                    )
+                all_factors.append(factors)
         except Exception:
             # Backward-compatible fallback for older model payloads.
             top_names = model_payload.get("top_feature_names", [])
             top_weights = model_payload.get("top_feature_weights", [])
+            factors = []
             for idx, name in enumerate(top_names[:5]):
                 weight = float(top_weights[idx]) if idx < len(top_weights) else 0.0
                 factors.append(
                     {
-                        "feature": self._humanize_feature_name(str(name)),
+                        "feature": _humanize_feature_name(str(name)),
                         "direction": "up" if weight >= 0 else "down",
                         "contribution": round(weight, 4),
                     }
                 )
+            all_factors = [list(factors) for _ in range(n_rows)]
 
-        if not factors:
-            factors.append(
-                {"feature": "model_intercept", "direction": "up", "contribution": 0.0}
-            )
-        return factors
+        return [
+            factors
+            or [{"feature": "model_intercept", "direction": "up", "contribution": 0.0}]
+            for factors in all_factors
+        ]
 
     # Load newest readable risk_model_*.joblib payload; skip unreadable artifacts.
     # Stores last failure message for diagnostics without crashing requests.
+    # Loaded payloads are cached per (path, mtime) and the ordered artifact
+    # listing for a few seconds, so steady-state requests do one stat() call.
     def _load_latest_model_payload(self) -> Dict[str, Any] | None:
-        if not self.model_dir.exists():
-            return None
-        model_files = list(self.model_dir.glob("risk_model_*.joblib"))
-        if not model_files:
+        if joblib is None:
             return None
-        try:
-            import joblib
-        except Exception:
-            return None
-        configured_version = str(getattr(settings, "RISK_MODEL_VERSION", "") or "").strip()
-        configured_filename = (
-            f"risk_model_{configured_version}.joblib" if configured_version else ""
-        )
 
-        def _artifact_sort_key(path: Path) -> tuple[int, int, float]:
-            # Prefer higher semantic version (risk-v3 > risk-v2 > risk-v1), then newer timestamp.
-            m = re.match(r"risk_model_risk-v(\d+)-(\d+)\.joblib$", path.name)
-            if m:
-                return (int(m.group(1)), int(m.group(2)), float(path.stat().st_mtime))
-            return (0, 0, float(path.stat().st_mtime))
-
-        ordered_files = sorted(model_files, key=_artifact_sort_key, reverse=True)
-        if configured_filename:
-            configured_paths = [p for p in ordered_files if p.name == configured_filename]
-            other_paths = [p for p in ordered_files if p.name != configured_filename]
-            ordered_files = configured_paths + other_paths
-
-        for model_path in ordered_files:
+        for model_path in self._model_file_candidates():
             try:
-                payload = joblib.load(model_path)
-                self._last_load_error = None
-                return payload
-            except Exception as exc:
-                self._last_load_error = f"{type(exc).__name__}: {exc}"
-                logger.warning(
-                    "Unable to load risk model '%s': %s", model_path.name, self._last_load_error
-                )
+                mtime_ns = model_path.stat().st_mtime_ns
+            except OSError:
                 continue
+            cached = _PAYLOAD_CACHE.get(model_path)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+            with _PAYLOAD_LOCK:
+                cached = _PAYLOAD_CACHE.get(model_path)
+                if cached is not None and cached[0] == mtime_ns:
+                    return cached[1]
+                try:
+                    payload = joblib.load(model_path)
+                    self._last_load_error = None
+                except Exception as exc:
+                    self._last_load_error = f"{type(exc).__name__}: {exc}"
+                    logger.warning(
+                        "Unable to load risk model '%s': %s", model_path.name, self._last_load_error
+                    )
+                    continue
+                _PAYLOAD_CACHE[model_path] = (mtime_ns, payload)
+                return payload
         return None
+
+    # Artifact paths in load-preference order: the configured version first,
+    # then by (semantic version, timestamp, mtime). The newest artifact is
+    # picked with max(); the full sort only happens if loading it fails.
+    def _model_file_candidates(self) -> Iterator[Path]:
+        configured_path, keyed = self._model_file_listing()
+        if configured_path is not None:
+            yield configured_path
+        if not keyed:
+            return
+        newest = max(keyed)[1]
+        if newest != configured_path:
+            yield newest
+        for _key, path in sorted(keyed, reverse=True):
+            if path != newest and path != configured_path:
+                yield path
+
+    # (configured artifact path or None, [(sort key, path), ...]) for the
+    # artifact directory, memoised for _LISTING_TTL seconds. Once that expires
+    # the listing is reused for another window if the directory's mtime_ns is
+    # unchanged (adding, removing or replacing an artifact bumps it), so the
+    # steady state is one stat per window instead of a directory scan.
+    def _model_file_listing(self) -> tuple[Path | None, List[tuple[tuple[int, int, float], Path]]]:
+        configured_version = str(getattr(settings, "RISK_MODEL_VERSION", "") or "").strip()
+        key = (self.model_dir, configured_version)
+        now = time.monotonic()
+        cached = _LISTING_CACHE.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[2]
+        try:
+            dir_mtime_ns: int | None = self.model_dir.stat().st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+        if cached is not None and cached[1] == dir_mtime_ns:
+            _LISTING_CACHE[key] = (now + _LISTING_TTL, dir_mtime_ns, cached[2])
+            return cached[2]
+
+        configured_path: Path | None = None
+        keyed: List[tuple[tuple[int, int, float], Path]] = []
+        if dir_mtime_ns is not None:
+            configured_filename = (
+                f"risk_model_{configured_version}.joblib" if configured_version else ""
+            )
+            # DirEntry caches its stat result, so each artifact costs one stat.
+            with os.scandir(self.model_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if not (name.startswith("risk_model_") and name.endswith(".joblib")):
+                        continue
+                    path = Path(entry.path)
+                    if name == configured_filename:
+                        configured_path = path
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        keyed.append((_artifact_sort_key(entry), path))
+                    except OSError:
+                        continue
+
+        listing = (configured_path, keyed)
+        _LISTING_CACHE[key] = (now + _LISTING_TTL, dir_mtime_ns, listing)
+        return listing
+
+
+# Prefer higher semantic version (risk-v3 > risk-v2 > risk-v1), then newer timestamp.
+def _artifact_sort_key(entry: os.DirEntry) -> tuple[int, int, float]:
+    mtime = float(entry.stat().st_mtime)
+    m = _ARTIFACT_NAME_RE.match(entry.name)
+    if m:
+        return (int(m.group(1)), int(m.group(2)), mtime)
+    return (0, 0, mtime)
+
+
+_FEATURE_NAME_ALIASES = {
+    "age_years": "age_years",
+    "days_since_admission": "days_since_admission",
+    "medication_count": "medications_count",
+    "current_prescription_count": "current_prescription_count",
+    "allergy_count": "allergy_count",
+    "high_risk_allergy_count": "high_risk_allergy_count",
+    "history_count": "medical_history_count",
+    "high_risk_history_count": "high_risk_history_count",
+    "past_history_count": "past_medical_history_count",
+    "high_risk_prescription_count": "high_risk_prescription_count",
+}
+
+
+# Convert transformed feature names (e.g. num__/cat__) to human-friendly labels.
+# The name universe is the fitted ColumnTransformer's output, so it stays small.
+@lru_cache(maxsize=256)
+def _humanize_feature_name(name: str) -> str:
+    aliases = _FEATURE_NAME_ALIASES
+    if name.startswith("num__"):
+        raw = name.replace("num__", "", 1)
+        return aliases.get(raw, raw)
+    if name.startswith("cat__"):
+        raw = name.replace("cat__", "", 1)
+        if "_" in raw:
+            field, value = raw.split("_", 1)
+            return f"{aliases.get(field, field)}={value}"
+        return aliases.get(raw, raw)
+    return aliases.get(name, name)
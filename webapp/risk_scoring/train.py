@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List
 
 from django.conf import settings
 
@@ -12,9 +12,36 @@ from .features import (
     FEATURE_CATEGORICAL_COLUMNS,
     FEATURE_COLUMN_ORDER,
     FEATURE_NUMERIC_COLUMNS,
-    feature_dicts_to_dataframe,
+    KNOWN_GENDERS,
 )
 
+# Resolved once at import; the training entry points raise a RuntimeError
+# naming the missing packages instead.
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError as exc:
+    np = pd = None
+    _PANDAS_IMPORT_ERROR: ImportError | None = exc
+else:
+    _PANDAS_IMPORT_ERROR = None
+
+try:
+    import joblib
+    import sklearn
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.compose import ColumnTransformer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import average_precision_score, brier_score_loss, roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+except ImportError as exc:
+    sklearn = None
+    _SKLEARN_IMPORT_ERROR: ImportError | None = exc
+else:
+    _SKLEARN_IMPORT_ERROR = None
+
 
 UCI_DATASET_METADATA = {
     "name": "Diabetes 130-US hospitals for years 1999-2008",
@@ -25,6 +52,22 @@ UCI_DATASET_METADATA = {
 }
 
 
+# The only CSV columns the feature mapping reads. Counts are small integers
+# (nullable, so blank cells still parse); strings are few distinct levels.
+_TRAINING_CSV_DTYPES = {
+    "age": "category",
+    "gender": "category",
+    "readmitted": "category",
+    "time_in_hospital": "Int16",
+    "num_medications": "Int16",
+    "number_diagnoses": "Int16",
+    "number_inpatient": "Int16",
+    "number_outpatient": "Int16",
+    "number_emergency": "Int16",
+}
+_TRAINING_CSV_CHUNK_ROWS = 100_000
+
+
 @dataclass
 class TrainingResult:
     model_version: str
@@ -34,28 +77,122 @@ class TrainingResult:
     metrics: Dict[str, float]
 
 
+# Midpoints of the ten UCI age brackets, '[0-10)' .. '[90-100)'.
+_AGE_MIDPOINTS = {f"[{lo}-{lo + 10})": float(lo + 5) for lo in range(0, 100, 10)}
+_AGE_BRACKET_RE = re.compile(r"\[(\d+)-(\d+)\)")
+
+
 def _age_bracket_to_years(age_str: str) -> float:
     """Map UCI-style age brackets like '[40-50)' to midpoint years."""
     if not age_str or not isinstance(age_str, str):
         return 45.0
-    match = re.match(r"\[(\d+)-(\d+)\)", age_str.strip())
+    age_str = age_str.strip()
+    midpoint = _AGE_MIDPOINTS.get(age_str)
+    if midpoint is not None:
+        return midpoint
+    match = _AGE_BRACKET_RE.match(age_str)
     if not match:
         return 45.0
     lo, hi = int(match.group(1)), int(match.group(2))
     return float((lo + hi) // 2)
 
 
-def _build_training_rows_from_csv(
+def _count_csv_records(csv_path: Path) -> int | None:
+    """Count data records by newlines, without parsing.
+
+    Returns None when line numbers may not be record numbers: blank lines
+    (skipped by read_csv) or quote characters (possible multi-line fields).
+    """
+    lines = 0
+    previous = b"\n"
+    with open(csv_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            if b'"' in block or b"\n\n" in block or b"\n\r\n" in block:
+                return None
+            if previous == b"\n" and block[:1] in (b"\n", b"\r"):
+                return None
+            lines += block.count(b"\n")
+            previous = block[-1:]
+    if previous != b"\n":
+        lines += 1
+    return max(0, lines - 1)
+
+
+def _training_features_from_csv_frame(df):
+    """Map raw UCI CSV columns to the app's feature schema + binary label array."""
+
+    def int_column(name: str):
+        if name not in df.columns:
+            return np.zeros(len(df), dtype=np.int64)
+        return df[name].fillna(0).to_numpy(dtype=np.int64)
+
+    # String columns are read as categoricals, so each transform runs once
+    # per distinct (stripped) value and is broadcast back through the codes.
+    # Missing cells have code -1, which picks the trailing "nan" level: the
+    # same text str() gives a missing value.
+    def categorical_column(name: str, default: str, transform):
+        if name not in df.columns:
+            return np.repeat(transform(pd.Series([default])), len(df))
+        column = df[name].astype("category")
+        levels = pd.Series([*column.cat.categories.astype(str), "nan"]).str.strip()
+        return transform(levels)[column.cat.codes.to_numpy()]
+
+    def age_midpoints(levels):
+        return np.array([_age_bracket_to_years(level) for level in levels], dtype=np.float32)
+
+    def genders(levels):
+        lowered = levels.str.lower()
+        return lowered.where(lowered.isin(["male", "female", "unknown"]), "unknown").to_numpy(
+            dtype=object
+        )
+
+    # Column-wise equivalent of mapping each CSV row through the app's
+    # feature schema; integer floor division and clipping match the
+    # per-row int() arithmetic exactly.
+    time_in_hospital = int_column("time_in_hospital")
+    num_medications = int_column("num_medications")
+    number_diagnoses = int_column("number_diagnoses")
+    number_inpatient = int_column("number_inpatient")
+    number_outpatient = int_column("number_outpatient")
+    number_emergency = int_column("number_emergency")
+
+    age_years = categorical_column("age", "", age_midpoints)
+    gender = categorical_column("gender", "unknown", genders)
+
+    frame = pd.DataFrame(
+        {
+            "age_years": age_years,
+            "days_since_admission": np.clip(time_in_hospital, 0, 30).astype(np.float32),
+            "medication_count": np.maximum(0, num_medications).astype(np.float32),
+            "current_prescription_count": np.maximum(0, num_medications // 2).astype(np.float32),
+            "allergy_count": np.clip(number_emergency, 0, 4).astype(np.float32),
+            "high_risk_allergy_count": (number_emergency >= 2).astype(np.float32),
+            "history_count": np.maximum(0, number_diagnoses).astype(np.float32),
+            "high_risk_history_count": ((number_inpatient + number_emergency) >= 2).astype(np.float32),
+            "past_history_count": np.maximum(
+                0, number_inpatient + number_outpatient + number_emergency
+            ).astype(np.float32),
+            "high_risk_prescription_count": (num_medications >= 12).astype(np.float32),
+            "gender": pd.Categorical(gender, categories=KNOWN_GENDERS),
+        },
+        columns=FEATURE_COLUMN_ORDER,
+    )
+    labels = categorical_column(
+        "readmitted", "NO", lambda levels: (levels == "<30").to_numpy(dtype=np.int8)
+    )
+
+    return frame, labels
+
+
+def _build_training_frame_from_csv(
     csv_path: Path,
     *,
     max_rows: int | None = 50_000,
     random_state: int = 42,
-) -> Tuple[List[Dict[str, object]], List[int]]:
-    """Load UCI CSV and map each row to the app's feature schema + binary label."""
-    try:
-        import pandas as pd
-    except ImportError as exc:
-        raise RuntimeError("pandas is required for CSV training.") from exc
+):
+    """Load UCI CSV as a feature DataFrame in pipeline column order + label array."""
+    if pd is None:
+        raise RuntimeError("pandas is required for CSV training.") from _PANDAS_IMPORT_ERROR
 
     csv_path = Path(csv_path)
     if not csv_path.exists():
@@ -64,70 +201,61 @@ def _build_training_rows_from_csv(
             "Provide --csv-path or place diabetic_data.csv in webapp/risk_scoring/data/."
         )
 
-    df = pd.read_csv(csv_path)
-    if max_rows and max_rows > 0 and len(df) > max_rows:
-        df = df.sample(n=max_rows, random_state=random_state).reset_index(drop=True)
-
-    rows: List[Dict[str, object]] = []
-    labels: List[int] = []
-
-    for _, r in df.iterrows():
-        age_years = _age_bracket_to_years(str(r.get("age", "")))
-        time_in_hospital = int(r.get("time_in_hospital", 0)) if pd.notna(r.get("time_in_hospital")) else 0
-        num_medications = int(r.get("num_medications", 0)) if pd.notna(r.get("num_medications")) else 0
-        number_diagnoses = int(r.get("number_diagnoses", 0)) if pd.notna(r.get("number_diagnoses")) else 0
-        number_inpatient = int(r.get("number_inpatient", 0)) if pd.notna(r.get("number_inpatient")) else 0
-        number_outpatient = int(r.get("number_outpatient", 0)) if pd.notna(r.get("number_outpatient")) else 0
-        number_emergency = int(r.get("number_emergency", 0)) if pd.notna(r.get("number_emergency")) else 0
-        prior_utilization = number_inpatient + number_outpatient + number_emergency
-
-        gender = (str(r.get("gender", "unknown")).strip().lower() or "unknown")[:20]
-        if gender not in ("male", "female", "unknown"):
-            gender = "unknown"
-
-        rows.append(
-            {
-                "age_years": float(age_years),
-                "days_since_admission": float(max(0, min(30, time_in_hospital))),
-                "medication_count": float(max(0, num_medications)),
-                "current_prescription_count": float(max(0, num_medications // 2)),
-                "allergy_count": float(max(0, min(4, number_emergency))),
-                "high_risk_allergy_count": float(1 if number_emergency >= 2 else 0),
-                "history_count": float(max(0, number_diagnoses)),
-                "high_risk_history_count": float(
-                    1 if (number_inpatient + number_emergency) >= 2 else 0
-                ),
-                "past_history_count": float(max(0, prior_utilization)),
-                "high_risk_prescription_count": float(1 if num_medications >= 12 else 0),
-                "gender": gender,
-            }
+    # Positions drawn exactly as df.sample(n=max_rows, random_state=...) would
+    # draw them. When the record count is known up front only those lines are
+    # parsed (the rest go to skiprows); otherwise the draw happens afterwards.
+    skip = None
+    order = None
+    if max_rows and max_rows > 0:
+        total = _count_csv_records(csv_path)
+        if total is not None and total > max_rows:
+            keep = np.random.RandomState(random_state).choice(total, size=max_rows, replace=False)
+            kept_lines = np.sort(keep)
+            skip = np.setdiff1d(np.arange(1, total + 1), kept_lines + 1, assume_unique=True)
+            order = np.searchsorted(kept_lines, keep)
+
+    # Stream the file so only one raw chunk is held at a time next to the
+    # compact feature frames built so far.
+    frames = []
+    label_parts = []
+    with pd.read_csv(
+        csv_path,
+        usecols=lambda column: column in _TRAINING_CSV_DTYPES,
+        dtype=_TRAINING_CSV_DTYPES,
+        skiprows=skip,
+        chunksize=_TRAINING_CSV_CHUNK_ROWS,
+    ) as reader:
+        for chunk in reader:
+            chunk_frame, chunk_labels = _training_features_from_csv_frame(chunk)
+            frames.append(chunk_frame)
+            label_parts.append(chunk_labels)
+    if not frames:
+        chunk_frame, chunk_labels = _training_features_from_csv_frame(pd.DataFrame())
+        frames.append(chunk_frame)
+        label_parts.append(chunk_labels)
+    frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    labels = np.concatenate(label_parts)
+
+    if order is None and max_rows and max_rows > 0 and len(frame) > max_rows:
+        order = np.random.RandomState(random_state).choice(len(frame), size=max_rows, replace=False)
+    if order is not None:
+        frame = frame.take(order).reset_index(drop=True)
+        labels = labels[order]
+    return frame, labels
+
+
+def _fit_and_save_pipeline(X, labels, model_dir: Path, model_version: str) -> TrainingResult:
+    if sklearn is None or pd is None:
+        raise RuntimeError("scikit-learn, joblib, and pandas are required.") from (
+            _SKLEARN_IMPORT_ERROR or _PANDAS_IMPORT_ERROR
         )
-        labels.append(1 if str(r.get("readmitted", "NO")).strip() == "<30" else 0)
-
-    return rows, labels
-
-
-def _fit_and_save_pipeline(X, labels: List[int], model_dir: Path, model_version: str) -> TrainingResult:
-    try:
-        import joblib
-        import numpy as np
-        import pandas as pd
-        import sklearn
-        from sklearn.calibration import CalibratedClassifierCV
-        from sklearn.compose import ColumnTransformer
-        from sklearn.linear_model import LogisticRegression
-        from sklearn.metrics import average_precision_score, brier_score_loss, roc_auc_score
-        from sklearn.model_selection import train_test_split
-        from sklearn.pipeline import Pipeline
-        from sklearn.preprocessing import OneHotEncoder, StandardScaler
-    except ImportError as exc:
-        raise RuntimeError("scikit-learn, joblib, and pandas are required.") from exc
 
     if not isinstance(X, pd.DataFrame):
         raise TypeError("X must be a pandas DataFrame")
 
     n = len(X)
-    positives = int(sum(labels))
+    labels = np.asarray(labels, dtype=np.int8)
+    positives = int(labels.sum())
     negatives = int(n - positives)
     if n < 3:
         raise ValueError(f"Need at least 3 rows, got {n}")
@@ -137,23 +265,27 @@ def _fit_and_save_pipeline(X, labels: List[int], model_dir: Path, model_version:
         missing = [col for col in FEATURE_COLUMN_ORDER if col not in X.columns]
         raise ValueError(f"Missing required feature columns: {missing}")
 
-    def _build_pipeline(c_value: float = 1.0) -> Pipeline:
-        preprocess = ColumnTransformer(
+    def _build_preprocess() -> ColumnTransformer:
+        return ColumnTransformer(
             transformers=[
                 ("num", StandardScaler(), FEATURE_NUMERIC_COLUMNS),
                 ("cat", OneHotEncoder(handle_unknown="ignore"), FEATURE_CATEGORICAL_COLUMNS),
             ],
             remainder="drop",
         )
-        model = LogisticRegression(
+
+    def _build_model(c_value: float = 1.0) -> LogisticRegression:
+        return LogisticRegression(
             max_iter=2000,
             C=float(c_value),
             class_weight="balanced",
         )
+
+    def _build_pipeline(c_value: float = 1.0) -> Pipeline:
         return Pipeline(
             steps=[
-                ("preprocess", preprocess),
-                ("model", model),
+                ("preprocess", _build_preprocess()),
+                ("model", _build_model(c_value)),
             ]
         )
 
@@ -173,10 +305,15 @@ def _fit_and_save_pipeline(X, labels: List[int], model_dir: Path, model_version:
         candidate_cs = [0.2, 0.5, 1.0, 2.0, 4.0]
         best_score = float("-inf")
 
+        # Every candidate shares the same train split, so the preprocessor is
+        # fitted and applied once and only the regularisation varies.
+        preprocess = _build_preprocess().fit(X_train)
+        Xt_train = preprocess.transform(X_train)
+        Xt_valid = preprocess.transform(X_valid)
         for c_value in candidate_cs:
-            candidate = _build_pipeline(c_value)
-            candidate.fit(X_train, y_train)
-            valid_prob = candidate.predict_proba(X_valid)[:, 1]
+            candidate = _build_model(c_value)
+            candidate.fit(Xt_train, y_train)
+            valid_prob = candidate.predict_proba(Xt_valid)[:, 1]
             roc_auc = float(roc_auc_score(y_valid, valid_prob))
             avg_precision = float(average_precision_score(y_valid, valid_prob))
             brier = float(brier_score_loss(y_valid, valid_prob))
@@ -239,10 +376,13 @@ def _fit_and_save_pipeline(X, labels: List[int], model_dir: Path, model_version:
     try:
         final = pipeline.named_steps["model"]
         coefs = final.coef_[0]
-        order = np.argsort(np.abs(coefs))[::-1][:12]
+        magnitudes = np.abs(coefs)
+        k = min(12, len(coefs))
+        order = np.argpartition(magnitudes, len(coefs) - k)[len(coefs) - k :]
+        order = order[np.lexsort((order, magnitudes[order]))[::-1]]
         names = pipeline.named_steps["preprocess"].get_feature_names_out()
-        top_feature_names = [str(names[i]) for i in order]
-        top_feature_weights = [float(coefs[i]) for i in order]
+        top_feature_names = names[order].astype(str).tolist()
+        top_feature_weights = coefs[order].astype(float).tolist()
     except Exception:
         pass
 
@@ -275,7 +415,9 @@ def _fit_and_save_pipeline(X, labels: List[int], model_dir: Path, model_version:
             "gender": "UCI gender -> app gender",
         },
     }
-    joblib.dump(payload, path)
+    # zlib is in the standard library, so any host that can run the service
+    # can load the artifact; joblib.load detects the compression itself.
+    joblib.dump(payload, path, compress=("zlib", 3))
     return TrainingResult(
         model_version=model_version,
         rows=n,
@@ -305,15 +447,15 @@ def train_and_save(
 
     if csv_path is None:
         csv_path = base_dir / "risk_scoring" / "data" / "diabetic_data.csv"
-    rows, labels = _build_training_rows_from_csv(
+    X, labels = _build_training_frame_from_csv(
         Path(csv_path),
         max_rows=max_rows,
         random_state=random_state,
     )
-    positives = int(sum(labels))
+    positives = int(labels.sum())
 
-    if len(rows) < min_rows:
-        raise RuntimeError(f"Not enough patients to train: rows={len(rows)}, required>={min_rows}.")
+    if len(X) < min_rows:
+        raise RuntimeError(f"Not enough patients to train: rows={len(X)}, required>={min_rows}.")
     if positives < 1:
         raise RuntimeError("Need at least one positive label in training CSV.")
     if positives < min_positives and not allow_low_positives:
@@ -322,7 +464,6 @@ def train_and_save(
             f"required>={min_positives}. Use a larger CSV slice or lower --min-positives."
         )
 
-    X = feature_dicts_to_dataframe(rows)
     if model_dir is None:
         model_dir = base_dir / "risk_scoring" / "artifacts"
     model_version = datetime.utcnow().strftime("risk-v3-%Y%m%d%H%M%S")